@@ -0,0 +1 @@
+"""Reproducible benchmarks for the analyzer and the AI request path."""
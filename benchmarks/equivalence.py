@@ -0,0 +1,219 @@
+"""
+Check the analyzer's fast paths against plain reference implementations.
+
+    python -m benchmarks.equivalence                  # every check, 2000 documents
+    python -m benchmarks.equivalence --docs 200 --seed 3
+    python -m benchmarks.equivalence --only index phrases
+    python -m benchmarks.equivalence --only shards --jobs 4
+
+Documents are generated from a fixed seed and mix rule phrases with filler,
+non-ASCII letters, NUL characters and stray punctuation. Each check raises on
+the first mismatch and names the document; the exit status is non-zero if any
+check failed.
+"""
+
+import argparse
+import functools
+import io
+import random
+import sys
+import time
+
+from writing_assistant import analysis
+from writing_assistant.index import DocumentIndex
+
+ODD_TOKENS = ["Café", "naïve", "états", "İİ", "x1y", "_ab", "a_b", "2nd", "\x00", "was\x00baked",
+              "WAS BAKED", "...", "x.", "y!", "Really?", "\n", ","]
+FILLER = ("the cat was walked by a dog and the writers draft their stories while editors "
+          "review each page before the proof is approved").split()
+RULE_PHRASES = (list(analysis.WORDY_PHRASES) + list(analysis.COMPLEX_WORDS)
+                + analysis.WEAK_WORDS + analysis.HEDGING_WORDS)
+
+
+def random_document(rng: random.Random, sentences: int = None) -> str:
+    """A few sentences of filler with rule phrases and odd tokens mixed in."""
+    out = []
+    for _ in range(rng.randint(0, 12) if sentences is None else sentences):
+        words = []
+        for _ in range(rng.choice((3, 6, 12, 24, 40))):
+            roll = rng.random()
+            pool = RULE_PHRASES if roll < 0.25 else ODD_TOKENS if roll < 0.3 else FILLER
+            words.append(rng.choice(pool))
+        sentence = " ".join(words)
+        out.append(sentence[:1].upper() + sentence[1:] + rng.choice(".!?.,"))
+    return " ".join(out)
+
+
+def check_index(docs: list[str]):
+    """DocumentIndex yields the tokens get_words finds in each sentence, at the right offsets."""
+    for n, text in enumerate(docs):
+        sentences = analysis.get_sentences(text)
+        index = DocumentIndex(sentences)
+        per_sentence = [[] for _ in sentences]
+        for start, end, sentence, token in zip(index.token_starts.tolist(), index.token_ends.tolist(),
+                                               index.token_sentence.tolist(), index.token_ids.tolist()):
+            word = index.words[token]
+            assert index.lowered[start:end] == word, f"document {n}: token {word!r} at wrong offset {start}"
+            per_sentence[sentence].append(word)
+        for i, sentence in enumerate(sentences):
+            assert per_sentence[i] == analysis.get_words(sentence), f"document {n}, sentence {i}: tokens differ"
+        assert index.word_counts().tolist() == [len(words) for words in per_sentence], f"document {n}: word counts"
+
+
+def naive_hits(phrases: list[str], sentences: list[str]) -> list[tuple[str, int, int, int]]:
+    """Every occurrence of every phrase, found one phrase and one sentence at a time."""
+    hits = []
+    for i, sentence in enumerate(sentences):
+        lowered = sentence.lower()
+        for phrase in phrases:
+            start = lowered.find(phrase)
+            while start != -1:
+                hits.append((phrase, i, start, start + len(phrase)))
+                start = lowered.find(phrase, start + 1)
+    return hits
+
+
+def check_phrases(docs: list[str]):
+    """The shared PhraseMatcher finds exactly the overlapping hits of a phrase-by-phrase search."""
+    matcher = analysis.rule_matcher()
+    for n, text in enumerate(docs):
+        sentences = analysis.get_sentences(text)
+        got = sorted(matcher.scan(DocumentIndex(sentences)))
+        expected = sorted(naive_hits(matcher.phrases, sentences))
+        assert got == expected, f"document {n}: phrase hits differ"
+
+
+def estimate(rules: list, size: int) -> float:
+    return (analysis.BASE_COST + sum(rule.cost for rule in rules)) * size / 1_000_000
+
+
+def check_budget(docs: list[str]):
+    """Plans stay within the budget, and a cut-off analysis equals one fed only the sentences within the limit.
+
+    Each document gets a budget covering between a tenth of it and all of it,
+    so some analyses drop expensive rules, some are cut off and some neither.
+    """
+    rules = list(analysis.RULES)
+    rng = random.Random(0)
+    for n, text in enumerate(docs):
+        size = analysis.encoded_size(text)
+        budget = estimate(rules, size) * rng.uniform(0.1, 1.2)
+        active, skipped = analysis.plan_rules(rules, size, budget)
+        assert all(rule.expensive for rule in skipped), f"document {n}: skipped a cheap rule"
+        assert estimate(active, size) <= budget or not any(rule.expensive for rule in active), \
+            f"document {n}: over budget with expensive rules left"
+        limit = analysis.size_limit(active, budget)
+        assert estimate(active, limit) <= budget, f"document {n}: size limit over budget"
+
+        sentences = analysis.get_sentences(text)
+        analyzer = analysis.TextAnalyzer(size=size, budget=budget, truncate=True)
+        assert analyzer.skipped == frozenset(rule.type for rule in skipped), f"document {n}: plan differs"
+        assert analysis.TextAnalyzer(size=size, budget=budget).limit is None, f"document {n}: cut off without opting in"
+        if analyzer.limit is None:
+            kept = sentences
+        else:
+            kept = list(analysis.take_within(analysis.iter_sentences([text]), limit))
+            assert kept == list(analysis.take_within(sentences, limit)), f"document {n}: lazy split differs"
+        for i in range(0, len(sentences), 3):
+            analyzer.feed(sentences[i:i + 3])
+        got = analyzer.result()
+
+        reference = analysis.TextAnalyzer(rules=active)
+        reference.feed(kept)
+        truncated = got.pop('truncated', None)
+        got.pop('skipped_rules', None)
+        assert got == reference.result(), f"document {n}: result differs from the leading sentences' one"
+        if analyzer.limit is None:
+            assert truncated is None, f"document {n}: truncated without a limit"
+        else:
+            assert truncated == {'analyzed': sum(len(s.encode()) + 1 for s in kept), 'total': size}, \
+                f"document {n}: wrong truncation note {truncated}"
+
+
+def check_shards(docs: list[str], jobs: int = 2):
+    """Shards merged in order give the serial result, in process and on a pool of `jobs` workers.
+
+    Every document is analyzed in 3-sentence shards and streamed in 7-byte
+    reads; then all of them, joined into one book of several SENTENCE_BATCH
+    shards, go through analyze_text and analyze_stream with `jobs` workers.
+    """
+    for n, text in enumerate(docs):
+        sentences = analysis.get_sentences(text)
+        streamed = analysis.iter_sentences(analysis.iter_text_chunks(io.BytesIO(text.encode()), chunk_size=7))
+        assert list(streamed) == sentences, f"document {n}: streamed sentences differ"
+        serial = analysis.TextAnalyzer(size=len(text))
+        serial.feed(sentences)
+        merged = analysis.TextAnalyzer(size=len(text))
+        for i in range(0, len(sentences), 3):
+            merged.merge(analysis.analyze_shard(sentences[i:i + 3], len(text)))
+        assert merged.result() == serial.result(), f"document {n}: merged shards differ"
+
+    book = " ".join(docs)
+    while len(analysis.get_sentences(book)) <= 2 * analysis.SENTENCE_BATCH:
+        book = f"{book} {book}"
+    serial = analysis.analyze_text(book, jobs=1)
+    assert analysis.analyze_text(book, jobs=jobs) == serial, "book: sharded analyze_text differs"
+    for workers in (1, jobs):
+        assert analysis.analyze_stream(io.BytesIO(book.encode()), jobs=workers) == serial, \
+            f"book: analyze_stream with {workers} workers differs"
+
+
+def check_ranking(docs: list[str]):
+    """top_issues returns a full sort of every capped issue, and no rule reports above its ceiling.
+
+    Each document is also ranked with k = 1 and k = 3, so the heap fills
+    early and rules are pruned.
+    """
+    for n, text in enumerate(docs):
+        analyzer = analysis.TextAnalyzer(size=len(text))
+        analyzer.feed(analysis.get_sentences(text))
+        ranked = []
+        for i, rule in enumerate(analyzer.rules):
+            found = rule.issues()
+            if rule.cap is not None:
+                found = found[:rule.cap]
+            for j, issue in enumerate(found):
+                assert issue['priority'] <= rule.ceiling(), f"document {n}: {rule.type} above its ceiling"
+                ranked.append(((issue['priority'], -i, -j), issue))
+        ranked.sort(key=lambda entry: entry[0], reverse=True)
+        for k in (1, 3, analysis.MAX_ISSUES):
+            expected = [issue for _, issue in ranked[:k]]
+            assert analyzer.top_issues(k) == expected, f"document {n}: top {k} issues differ"
+
+
+CHECKS = {
+    "index": check_index,
+    "phrases": check_phrases,
+    "budget": check_budget,
+    "shards": check_shards,
+    "ranking": check_ranking,
+}
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.equivalence",
+                                     description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--docs", type=int, default=2000, help="random documents per check")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--only", nargs="+", choices=list(CHECKS), help="run only these checks")
+    parser.add_argument("--jobs", type=int, default=2, help="processes for the sharded analyses")
+    args = parser.parse_args(argv)
+    checks = dict(CHECKS, shards=functools.partial(check_shards, jobs=args.jobs))
+
+    rng = random.Random(args.seed)
+    docs = [random_document(rng) for _ in range(args.docs)]
+    failed = 0
+    for name in args.only or checks:
+        start = time.perf_counter()
+        try:
+            checks[name](docs)
+        except AssertionError as e:
+            failed += 1
+            print(f"{name:<10} FAILED  {e}")
+            continue
+        print(f"{name:<10} ok      {time.perf_counter() - start:6.2f} s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
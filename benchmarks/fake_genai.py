@@ -0,0 +1,116 @@
+"""
+Local stand-in for `google.genai.Client` with configurable latency and 429 injection.
+
+Understands the app's batch prompt (answers with a JSON array of rewrites) so the
+whole AI path can be exercised without network access or quota.
+"""
+
+import json
+import random
+import asyncio
+import threading
+import time
+
+
+class FakeModel:
+    def __init__(self, name: str):
+        self.name = name
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeModels:
+    def __init__(self, owner: "FakeClient"):
+        self.owner = owner
+
+    def list(self):
+        self.owner._call("list")
+        return [FakeModel("models/gemini-2.0-pro"), FakeModel("models/gemini-2.0-flash")]
+
+    def generate_content(self, model: str, contents: str, config=None):
+        self.owner._call("generate")
+        return FakeResponse(self.owner.answer(contents))
+
+    def generate_content_stream(self, model: str, contents: str, config=None):
+        self.owner._call("generate")
+        text = self.owner.answer(contents)
+        step = max(len(text) // 8, 1)
+        for i in range(0, len(text), step):
+            yield FakeResponse(text[i:i + step])
+
+
+class FakeAsyncModels:
+    """`client.aio.models`: the same answers, waiting with asyncio.sleep."""
+
+    def __init__(self, owner: "FakeClient"):
+        self.owner = owner
+
+    async def generate_content(self, model: str, contents: str, config=None):
+        await self.owner._acall("generate")
+        return FakeResponse(self.owner.answer(contents))
+
+    async def generate_content_stream(self, model: str, contents: str, config=None):
+        await self.owner._acall("generate")
+        text = self.owner.answer(contents)
+        step = max(len(text) // 8, 1)
+
+        async def chunks():
+            for i in range(0, len(text), step):
+                yield FakeResponse(text[i:i + step])
+        return chunks()
+
+
+class FakeAio:
+    def __init__(self, owner: "FakeClient"):
+        self.models = FakeAsyncModels(owner)
+
+
+class FakeClient:
+    """Drop-in for genai.Client.
+
+    `latency` seconds (plus up to `jitter`) are spent per call; each generate call
+    fails with a RESOURCE_EXHAUSTED error with probability `error_rate`.
+    """
+
+    def __init__(self, api_key: str = None, latency: float = 0.2, jitter: float = 0.05,
+                 error_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {"list": 0, "generate": 0, "throttled": 0}
+        self.models = FakeModels(self)
+        self.aio = FakeAio(self)
+
+    def _admit(self, kind: str) -> tuple[float, bool]:
+        with self.lock:
+            self.counts[kind] += 1
+            delay = self.latency + self.rng.uniform(0, self.jitter)
+            throttled = kind == "generate" and self.rng.random() < self.error_rate
+            if throttled:
+                self.counts["throttled"] += 1
+        return delay, throttled
+
+    def _call(self, kind: str):
+        delay, throttled = self._admit(kind)
+        time.sleep(delay)
+        if throttled:
+            raise RuntimeError("429 RESOURCE_EXHAUSTED: quota exceeded (fake)")
+
+    async def _acall(self, kind: str):
+        delay, throttled = self._admit(kind)
+        await asyncio.sleep(delay)
+        if throttled:
+            raise RuntimeError("429 RESOURCE_EXHAUSTED: quota exceeded (fake)")
+
+    def answer(self, prompt: str) -> str:
+        if "ITEMS:\n" in prompt:
+            items = json.loads(prompt.split("ITEMS:\n", 1)[1])
+            return json.dumps([{"id": item["id"], "rewrite": item["text"].upper()} for item in items])
+        if "TEXT:\n" in prompt:
+            return "Nice work overall. " * 40
+        return prompt.rsplit("\n\n", 1)[-1].upper()
@@ -0,0 +1,279 @@
+"""
+Benchmark the rule-based analyzer and the AI request path.
+
+    python -m benchmarks.run                       # full run, JSON on stdout
+    python -m benchmarks.run --quick -o bench.json
+    python -m benchmarks.run --ai-latency 0.5 --ai-error-rate 0.2
+    python -m benchmarks.run --skip-ai --startup-runs 10
+    python -m benchmarks.run --quick --skip-ai --jobs 8
+
+Corpora are generated from a fixed seed so numbers are comparable between runs.
+Results are machine-readable: throughput (MB/s), p50/p95 latency (ms) and peak
+traced memory (MB) per benchmark.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from writing_assistant import ai, aio, analysis
+from writing_assistant.index import DocumentIndex
+
+from .fake_genai import FakeClient
+
+FIRST_PAINT_TARGET = 0.3  # seconds; the app's target, writing_assistant_app.FIRST_PAINT_TARGET
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+QUICK_SIZES = SIZES[:4]
+RULE_COUNTS = [50, 200, 1000]
+
+FILLER = ("the quick brown fox jumps over a lazy dog while writers draft their stories "
+          "and editors review each page with care before the final proof is approved").split()
+RULE_PHRASES = (list(analysis.WORDY_PHRASES) + list(analysis.COMPLEX_WORDS)
+                + analysis.WEAK_WORDS + analysis.HEDGING_WORDS + ["was reviewed", "were approved"])
+
+
+def make_corpus(size: int, seed: int = 0) -> str:
+    """Synthetic prose of about `size` bytes; roughly one sentence in five trips a rule."""
+    rng = random.Random(seed)
+    sentences = []
+    total = 0
+    while total < size:
+        words = [rng.choice(FILLER) for _ in range(rng.randint(6, 36))]
+        if rng.random() < 0.2:
+            words.insert(rng.randrange(len(words)), rng.choice(RULE_PHRASES))
+        sentence = " ".join(words).capitalize() + rng.choice(".!?.")
+        sentences.append(sentence)
+        total += len(sentence) + 1
+    return " ".join(sentences)[:size]
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+
+def measure(name: str, fn, repeats: int, size: int = None, setup=None, **extra) -> dict:
+    """Time `fn` `repeats` times, then once more under tracemalloc for peak memory."""
+    timings = []
+    for _ in range(repeats):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    result = {
+        "name": name,
+        "repeats": repeats,
+        "p50_ms": round(percentile(timings, 50) * 1000, 3),
+        "p95_ms": round(percentile(timings, 95) * 1000, 3),
+        "peak_mem_mb": round(peak / 1e6, 3),
+        **extra,
+    }
+    if size is not None:
+        result["size_bytes"] = size
+        result["throughput_mb_s"] = round(size / 1e6 / percentile(timings, 50), 3)
+    return result
+
+
+def repeats_for(size: int) -> int:
+    return max(3, min(50, 2_000_000 // size))
+
+
+def bench_analyzer(sizes: list[int]) -> list[dict]:
+    results = []
+    for size in sizes:
+        text = make_corpus(size)
+        repeats = repeats_for(size)
+
+        def cold_cache():
+            analysis.SENTENCE_CACHE = analysis.SentenceCache()
+
+        results.append(measure("get_sentences", lambda: analysis.get_sentences(text), repeats, size))
+        results.append(measure("get_words", lambda: analysis.get_words(text), repeats, size))
+        results.append(measure("document_index", lambda: DocumentIndex(analysis.get_sentences(text)), repeats, size))
+        results.append(measure("analyze_text_cold", lambda: analysis.analyze_text(text),
+                               repeats, size, setup=cold_cache))
+        analysis.analyze_text(text)
+        results.append(measure("analyze_text_warm", lambda: analysis.analyze_text(text), repeats, size))
+        _report(results[-5:])
+    return results
+
+
+def bench_parallel(size: int, jobs: int) -> list[dict]:
+    """Sharded analysis on `jobs` processes against the serial run it must match."""
+    text = make_corpus(size)
+    repeats = repeats_for(size)
+    serial = analysis.analyze_text(text, jobs=1)
+    if analysis.analyze_text(text, jobs=jobs) != serial:
+        raise AssertionError("sharded analysis differs from the serial result")
+
+    # Worker caches stay warm between repeats, so both runs are measured warm
+    results = [
+        measure("analyze_text_serial", lambda: analysis.analyze_text(text, jobs=1), repeats, size, jobs=1),
+        measure("analyze_text_sharded", lambda: analysis.analyze_text(text, jobs=jobs), repeats, size, jobs=jobs),
+    ]
+    _report(results)
+    return results
+
+
+def bench_rule_count(size: int) -> list[dict]:
+    """Dictionary scan cost as the number of phrases grows."""
+    index = DocumentIndex(analysis.get_sentences(make_corpus(size)))
+    rng = random.Random(1)
+    results = []
+    for count in RULE_COUNTS:
+        extra = {"".join(rng.choice("abcdefghijklmnopqrstuvwxyz ") for _ in range(rng.randint(4, 18))).strip()
+                 for _ in range(count)}
+        matcher = analysis.PhraseMatcher(RULE_PHRASES + sorted(p for p in extra if p))
+        results.append(measure("rule_scan", lambda: matcher.scan(index), repeats_for(size),
+                               size, rules=len(matcher.phrases)))
+    _report(results)
+    return results
+
+
+async def run_ai_analysis(issues: list[dict], text: str, api_key: str) -> dict:
+    """The app's AI flow on the asyncio backend: batch rewrite and coach concurrently, then single retries."""
+    batch = asyncio.ensure_future(aio.get_batch_suggestions(issues, api_key))
+    coach = asyncio.ensure_future(aio.get_full_analysis(text, lambda chunk: None, api_key))
+    rewrites, error = await batch
+    retries = await asyncio.gather(*(aio.get_ai_suggestion(issue['type'], issue['original'], api_key)
+                                     for issue, rewrite in zip(issues, rewrites) if rewrite is None and not error))
+    rewritten = sum(1 for r in rewrites if r) + sum(1 for suggestion, _ in retries if suggestion)
+    coach_ok = (await coach)[0] is not None
+    return {"fallbacks": len(issues) - rewritten, "coach_failed": not coach_ok}
+
+
+def bench_ai(runs: int, latency: float, error_rate: float, key_count: int = 1) -> list[dict]:
+    """Per-analysis latency on the Gemini path against local fake clients, one per key."""
+    keys = [f"benchmark-key-{i}" for i in range(key_count)]
+    api_key = keys[0]
+    clients = [FakeClient(latency=latency, error_rate=error_rate, seed=i) for i in range(key_count)]
+    # Install the fakes in the pools; lift the free-tier limit so the clients are what's measured
+    for key, client in zip(keys, clients):
+        ai._clients[key] = client
+        ai._rate_limiters[key] = ai.TokenBucket(10 ** 6)
+        ai._models.pop(key, None)
+    os.environ["GOOGLE_API_KEYS"] = ",".join(keys[1:])
+
+    def count(kind: str) -> int:
+        return sum(client.counts[kind] for client in clients)
+
+    text = make_corpus(2_000, seed=7)
+    issues = analysis.analyze_text(text)['issues']
+    outcomes = []
+    stats_before = ai.get_resilience_stats()
+
+    def fresh_cache():
+        ai._response_cache = ai.ResponseCache(":memory:")
+
+    def run():
+        outcomes.append(aio.get_backend().submit(run_ai_analysis(issues, text, api_key)).result())
+
+    generated, throttled = count("generate"), count("throttled")
+    result = measure("ai_analysis_async", run, runs, setup=fresh_cache,
+                     issues=len(issues), latency_s=latency, error_rate=error_rate, keys=key_count)
+    total = len(outcomes)
+    result["requests_per_analysis"] = round((count("generate") - generated) / total, 2)
+    result["throttled"] = count("throttled") - throttled
+    result["fallbacks_per_analysis"] = round(sum(o["fallbacks"] for o in outcomes) / total, 2)
+    result["coach_failures"] = sum(o["coach_failed"] for o in outcomes)
+    stats = ai.get_resilience_stats()
+    for counter in ("retries", "failovers", "trips", "fallbacks"):
+        result[counter] = stats[counter] - stats_before[counter]
+    results = [result]
+    _report(results)
+    return results
+
+
+def bench_startup(runs: int) -> list[dict]:
+    """Time to first paint of the app on fresh interpreters (see benchmarks/startup.py)."""
+    samples = []
+    for _ in range(runs):
+        child = subprocess.run([sys.executable, "-m", "benchmarks.startup"], capture_output=True, text=True,
+                               check=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        samples.append(json.loads(child.stdout))
+    first_paint = [sample["first_paint_s"] for sample in samples]
+    results = [{
+        "name": "app_first_paint",
+        "repeats": runs,
+        "p50_ms": round(percentile(first_paint, 50) * 1000, 3),
+        "p95_ms": round(percentile(first_paint, 95) * 1000, 3),
+        "peak_mem_mb": round(max(sample["max_rss_mb"] for sample in samples), 3),
+        "target_ms": round(FIRST_PAINT_TARGET * 1000),
+        "first_run_p50_ms": round(percentile([sample["first_run_s"] for sample in samples], 50) * 1000, 3),
+        "genai_imported": any(sample["genai_imported"] for sample in samples),
+    }]
+    _report(results)
+    return results
+
+
+def _report(results: list[dict]):
+    for r in results:
+        rate = f"{r['throughput_mb_s']:9.2f} MB/s" if "throughput_mb_s" in r else " " * 14
+        size = f"{r['size_bytes']:>10,}B" if "size_bytes" in r else " " * 11
+        notes = "  ".join(f"{key}={r[key]}" for key in ("rules", "requests_per_analysis", "fallbacks_per_analysis",
+                                                        "target_ms") if key in r)
+        print(f"{r['name']:<18}{size} {rate}  p50 {r['p50_ms']:10.2f} ms  p95 {r['p95_ms']:10.2f} ms"
+              f"  peak {r['peak_mem_mb']:8.2f} MB  {notes}".rstrip(), file=sys.stderr)
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-o", "--output", default="-", help="JSON results file (default: stdout)")
+    parser.add_argument("--quick", action="store_true", help="skip the 10 MB corpus")
+    parser.add_argument("--ai-runs", type=int, default=20)
+    parser.add_argument("--ai-latency", type=float, default=0.2, help="fake model latency in seconds")
+    parser.add_argument("--ai-error-rate", type=float, default=0.0, help="fraction of calls failing with 429")
+    parser.add_argument("--ai-keys", type=int, default=1, help="API keys to spread requests over")
+    parser.add_argument("--skip-ai", action="store_true")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                        help="processes for the sharded analysis benchmark (default: number of CPUs)")
+    parser.add_argument("--startup-runs", type=int, default=5, help="cold app starts to time (0 to skip)")
+    args = parser.parse_args(argv)
+
+    sizes = QUICK_SIZES if args.quick else SIZES
+    results = bench_analyzer(sizes)
+    results += bench_rule_count(100_000)
+    if args.jobs > 1:
+        results += bench_parallel(sizes[-1], args.jobs)
+    if not args.skip_ai:
+        results += bench_ai(args.ai_runs, args.ai_latency, args.ai_error_rate, args.ai_keys)
+    if args.startup_runs:
+        results += bench_startup(args.startup_runs)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "results": results,
+    }
+    if args.output == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,38 @@
+"""
+One cold start of the app, run in a fresh interpreter by `benchmarks.run`.
+
+Streamlit is imported first, as a server worker already has it loaded; the
+script run then pays for the package imports and setup up to the header.
+Prints JSON: time to first paint, whole first run, and whether google.genai
+got imported.
+"""
+
+import json
+import os
+import resource
+import sys
+import time
+
+import streamlit  # noqa: F401  (loaded by the server before any script runs)
+from streamlit.testing.v1 import AppTest
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "writing_assistant_app.py")
+
+
+def main() -> int:
+    start = time.perf_counter()
+    AppTest.from_file(APP, default_timeout=60).run()
+    run = time.perf_counter() - start
+
+    from writing_assistant.tracing import TRACER
+    json.dump({
+        "first_paint_s": TRACER.snapshot()["stages"]["first_paint"]["last"],
+        "first_run_s": run,
+        "genai_imported": "google.genai" in sys.modules,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }, sys.stdout)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,14 @@
+"""
+Writing Assistant core, usable without Streamlit.
+
+`writing_assistant.analysis` holds the rule-based analyzer and
+`writing_assistant.ai` the Gemini helpers, `writing_assistant.providers`
+puts Gemini, local and HTTP rewriters behind one interface,
+`writing_assistant.readability` the NumPy readability indices and
+`writing_assistant.memo` caches whole-document results;
+`python -m writing_assistant` runs the analyzer over files from the command line.
+"""
+
+from .analysis import analyze_stream, analyze_text, get_sentences, get_words
+
+__all__ = ["analyze_stream", "analyze_text", "get_sentences", "get_words"]
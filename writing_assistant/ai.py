@@ -0,0 +1,683 @@
+"""
+Gemini helpers: client pool, key routing, rate limiting, retries, response cache and prompts.
+Has no Streamlit dependency; callers pass the API key explicitly. The
+google.genai SDK is imported on first use, so importing this module is cheap.
+
+Requests are spread over every configured key (the caller's key or
+GOOGLE_API_KEY, plus the GOOGLE_API_KEYS pool), each with its own quota and
+breaker, and fail over to another key when one is throttled.
+
+Prompt sizes are estimated before sending and oversized prompts refused; a
+document too long for one coach prompt is coached section by section and the
+notes merged (map-reduce). The requests themselves are made by
+`writing_assistant.aio`.
+"""
+
+import os
+import re
+import json
+import math
+import asyncio
+import random
+import hashlib
+import sqlite3
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+from .analysis import SENTENCE_BOUNDARY
+from .tracing import incr, span, traced
+
+
+MODEL_CACHE_TTL = 3600  # seconds before model discovery runs again for a key
+DEFAULT_MODEL = "gemini-1.5-flash-latest"
+# Model name fragments to look for, best first: a light model for the short
+# rewrites, a stronger one for the whole-document coach
+MODEL_TIERS = {
+    "rewrite": ("flash-lite", "flash"),
+    "coach": ("pro", "flash"),
+}
+NON_TEXT_MODELS = ("embedding", "tts", "image", "audio", "live", "vision")  # listed, but not for prose
+FREE_TIER_RPM = 15  # Gemini free tier: 15 requests/min per key
+RATE_LIMIT_WAIT = 30  # seconds a request may queue for a token before giving up
+AI_CACHE_PATH = os.environ.get(
+    "WRITING_ASSISTANT_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "writing_assistant", "ai_cache.sqlite3"),
+)
+RETRY_ATTEMPTS = 3  # retries after the first throttled attempt
+BACKOFF_BASE = 1.0  # seconds; doubles on every retry, with jitter
+BACKOFF_MAX = 20.0  # longest single wait; a longer retry-after hint opens the breaker instead
+BREAKER_THRESHOLD = 3  # consecutive throttles before a key's breaker opens
+BREAKER_COOLDOWN = 30  # seconds an open breaker sends calls straight to the fallback
+AI_CACHE_TTL = 7 * 24 * 3600  # seconds a cached response stays valid
+AI_CACHE_MAX_BYTES = 50 * 1024 * 1024  # least recently used entries go first past this
+# Token estimates, made before sending: the larger of a character and a word
+# count, so both prose and long unbroken tokens are over- rather than under-counted
+CHARS_PER_TOKEN = 4
+TOKENS_PER_WORD = 1.35
+MAX_PROMPT_TOKENS = 32000  # estimated prompts above this are refused, never sent
+# Longer documents are coached in sections of at most this many tokens, sent
+# concurrently, and the section notes merged by a final request
+COACH_SECTION_TOKENS = int(os.environ.get("WRITING_ASSISTANT_COACH_SECTION_TOKENS", 8000))
+MAX_COACH_SECTIONS = 12  # beyond this the document is too long to coach
+
+
+# Process-wide pools, keyed by API key
+_pool_lock = threading.Lock()
+_clients = {}
+_rate_limiters = {}
+_models = {}  # api_key -> (model name, expiry on the monotonic clock)
+_discovery_locks = {}
+_breakers = {}
+_loads = {}  # api_key -> requests in flight
+_rotation = itertools.count()  # breaks ties between equally loaded keys
+_response_cache = None
+
+
+def _pool_weights() -> dict:
+    """GOOGLE_API_KEYS as {key: weight}: comma-separated keys, each optionally `key:weight`."""
+    weights = {}
+    for entry in os.environ.get("GOOGLE_API_KEYS", "").split(","):
+        key, _, weight = entry.strip().partition(":")
+        if not key:
+            continue
+        try:
+            weights[key] = max(float(weight or 1), 0.01)
+        except ValueError:
+            weights[key] = 1.0
+    return weights
+
+
+def get_api_key() -> str:
+    """API key from the environment: GOOGLE_API_KEY, else the first pooled key."""
+    return os.environ.get("GOOGLE_API_KEY") or next(iter(_pool_weights()), "")
+
+
+def get_api_keys(api_key: str = None) -> list[str]:
+    """Every key requests may go out on: `api_key` (or GOOGLE_API_KEY) first, then the pool."""
+    keys = [api_key or get_api_key(), *_pool_weights()]
+    return list(dict.fromkeys(key for key in keys if key))
+
+
+def key_label(api_key: str) -> str:
+    """Safe to show or export: the last four characters only."""
+    return f"...{api_key[-4:]}"
+
+
+def _genai():
+    """The google.genai SDK. Imported on first AI use: it is over half a second of startup."""
+    from google import genai
+    return genai
+
+
+def json_response_config():
+    """Generation config asking the model for a JSON response."""
+    return _genai().types.GenerateContentConfig(response_mime_type="application/json")
+
+
+def _client_for_key(api_key: str):
+    """One shared Gemini client per API key for the whole process."""
+    with _pool_lock:
+        if api_key not in _clients:
+            _clients[api_key] = _genai().Client(api_key=api_key)
+        return _clients[api_key]
+
+
+class TokenBucket:
+    """Thread-safe token bucket allowing `rate` requests per `per` seconds."""
+
+    def __init__(self, rate: int, per: float = 60.0):
+        self.capacity = rate
+        self.tokens = float(rate)
+        self.fill_rate = rate / per
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def try_acquire(self) -> float:
+        """Take one token if available and return 0, else the seconds until one is."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.fill_rate
+
+    def available(self) -> float:
+        """Tokens left right now, without taking one."""
+        with self.lock:
+            return min(self.capacity, self.tokens + (time.monotonic() - self.updated) * self.fill_rate)
+
+    async def acquire_async(self, timeout: float = None) -> bool:
+        """Take one token, waiting on the event loop for a refill if needed. False if `timeout` runs out."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
+
+
+def _rate_limiter_for_key(api_key: str) -> TokenBucket:
+    """Quota is per key, so every session using a key shares one bucket."""
+    with _pool_lock:
+        if api_key not in _rate_limiters:
+            _rate_limiters[api_key] = TokenBucket(FREE_TIER_RPM)
+        return _rate_limiters[api_key]
+
+
+class RateLimited(Exception):
+    """Raised instead of calling the API when a key's breaker is open or its quota wait ran out."""
+
+
+class PromptTooLarge(ValueError):
+    """Raised instead of sending a prompt whose estimated size is over the limit."""
+
+
+_stats_lock = threading.Lock()
+_stats = {"retries": 0, "failovers": 0, "trips": 0, "fallbacks": 0}
+
+
+def _count(name: str):
+    with _stats_lock:
+        _stats[name] += 1
+    incr(f"{name}_total")
+
+
+def get_resilience_stats() -> dict:
+    """Counters for retries, failovers, breaker trips and fallbacks, plus keys whose breaker is open."""
+    with _stats_lock:
+        stats = dict(_stats)
+    with _pool_lock:
+        breakers = list(_breakers.values())
+    stats["open_breakers"] = sum(1 for breaker in breakers if not breaker.allow())
+    return stats
+
+
+class CircuitBreaker:
+    """Stops calls for a key after repeated throttling.
+
+    After `threshold` consecutive throttles the breaker opens for `cooldown`
+    seconds (or longer if the server asked for it). The first call after that is
+    a probe: one more throttle reopens it, a success closes it.
+    """
+
+    def __init__(self, threshold: int = BREAKER_THRESHOLD, cooldown: float = BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.open_until = 0.0
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self.lock:
+            return time.monotonic() >= self.open_until
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+
+    def record_throttle(self, retry_after: float = None):
+        with self.lock:
+            self.failures += 1
+            if self.failures < self.threshold and (retry_after or 0) <= BACKOFF_MAX:
+                return
+            self.open_until = time.monotonic() + max(self.cooldown, retry_after or 0)
+            self.failures = self.threshold - 1
+        _count("trips")
+
+
+def _breaker_for_key(api_key: str) -> CircuitBreaker:
+    with _pool_lock:
+        if api_key not in _breakers:
+            _breakers[api_key] = CircuitBreaker()
+        return _breakers[api_key]
+
+
+def pick_key(keys: list[str], exclude=()) -> str:
+    """Route a request: the least loaded of `keys` by requests in flight per unit of weight.
+
+    Keys whose breaker is open are skipped and keys with quota left right now come
+    first; keys in `exclude` (already throttled on this call) are used only when
+    nothing else is left. Ties rotate. None when every breaker is open.
+    """
+    weights = _pool_weights()
+    with _pool_lock:
+        loads = dict(_loads)
+    start = next(_rotation)
+    candidates = [
+        (key in exclude, _rate_limiter_for_key(key).available() < 1,
+         loads.get(key, 0) / weights.get(key, 1.0), (i - start) % len(keys), key)
+        for i, key in enumerate(keys)
+        if _breaker_for_key(key).allow()
+    ]
+    return min(candidates)[-1] if candidates else None
+
+
+def can_fail_over(keys: list[str], tried) -> bool:
+    """Whether a key other than those `tried` can take the request now."""
+    return any(key not in tried and _breaker_for_key(key).allow() for key in keys)
+
+
+@contextmanager
+def in_flight(api_key: str):
+    """Count a request against `api_key`'s load while it runs."""
+    with _pool_lock:
+        _loads[api_key] = _loads.get(api_key, 0) + 1
+    incr("key_requests_total", key=key_label(api_key))
+    try:
+        yield
+    finally:
+        with _pool_lock:
+            _loads[api_key] -= 1
+
+
+def get_key_stats(api_key: str = None) -> list[dict]:
+    """Routing state per key: weight, requests in flight, quota left and breaker state."""
+    weights = _pool_weights()
+    with _pool_lock:
+        loads = dict(_loads)
+    return [
+        {
+            "key": key_label(key),
+            "weight": weights.get(key, 1.0),
+            "in_flight": loads.get(key, 0),
+            "quota_left": int(_rate_limiter_for_key(key).available()),
+            "breaker_open": not _breaker_for_key(key).allow(),
+        }
+        for key in get_api_keys(api_key)
+    ]
+
+
+RETRY_HINT = re.compile(r"retry(?:Delay['\"]?:\s*['\"]?|\s+in\s+)(\d+(?:\.\d+)?)s", re.IGNORECASE)
+
+
+def is_rate_limited(error: Exception) -> bool:
+    error_msg = str(error)
+    return isinstance(error, RateLimited) or "429" in error_msg or "RESOURCE_EXHAUSTED" in error_msg
+
+
+def retry_after(error: Exception) -> float:
+    """Server-suggested wait in seconds, from a Retry-After header or a RetryInfo delay."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if headers:
+        try:
+            return float(headers.get("retry-after"))
+        except (TypeError, ValueError):
+            pass
+    match = RETRY_HINT.search(str(error))
+    return float(match.group(1)) if match else None
+
+
+def _record_usage(usage, kind: str):
+    """Add a response's token counts (usage_metadata) to the tracer."""
+    if usage is None:
+        return
+    for field, direction in (("prompt_token_count", "prompt"), ("candidates_token_count", "output")):
+        count = getattr(usage, field, None)
+        if count:
+            incr("tokens_total", count, kind=kind, direction=direction)
+
+
+def retry_delay(error: Exception, attempt: int, breaker: CircuitBreaker, can_retry=None,
+                failover: bool = False) -> float:
+    """Seconds to back off before retrying a failed call; re-raises `error` if it should not be retried.
+
+    With `failover` (another key can take the retry) there is no wait.
+    """
+    if not is_rate_limited(error):
+        raise error
+    hint = retry_after(error)
+    breaker.record_throttle(hint)
+    if attempt == RETRY_ATTEMPTS or (can_retry and not can_retry()):
+        raise error
+    if failover:
+        _count("failovers")
+        return 0.0
+    if not breaker.allow():
+        raise error
+    _count("retries")
+    backoff = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)
+    return hint if hint is not None else random.uniform(backoff / 2, backoff)
+
+
+def rewrite_error(error: Exception) -> str:
+    """Message shown on an issue card when a rewrite fell back to the rule-based one."""
+    _count("fallbacks")
+    if is_rate_limited(error):
+        return "Rate limit - wait 15 seconds"
+    return f"AI error: {str(error)[:100] or type(error).__name__}"
+
+
+def coach_error(error: Exception) -> str:
+    """Message shown instead of the coach feedback."""
+    _count("fallbacks")
+    if is_rate_limited(error):
+        return "Rate limit exceeded. Please wait 15-30 seconds and try again."
+    return f"Error: {str(error) or type(error).__name__}"
+
+
+class ResponseCache:
+    """On-disk cache of model responses keyed by a hash of what was asked.
+
+    Entries expire after `ttl` seconds; once the stored text passes `max_bytes`
+    the least recently used entries are evicted.
+    """
+
+    def __init__(self, path: str, ttl: float = AI_CACHE_TTL, max_bytes: int = AI_CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self.db.commit()
+
+    @staticmethod
+    def key(kind: str, model_name: str, prompt: str) -> str:
+        """Content address for a request. The prompt carries the template, issue type and text."""
+        payload = json.dumps([kind, model_name, prompt], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> str:
+        now = time.time()
+        with self.lock:
+            row = self.db.execute(
+                "SELECT value, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.db.commit()
+                return None
+            self.db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self.db.commit()
+            return row[0]
+
+    def put(self, key: str, value: str):
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created, accessed) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            self.db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+            total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                for old_key, old_size in self.db.execute(
+                    "SELECT key, size FROM responses ORDER BY accessed"
+                ).fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    self.db.execute("DELETE FROM responses WHERE key = ?", (old_key,))
+                    total -= old_size
+            self.db.commit()
+
+
+def get_response_cache() -> ResponseCache:
+    """Process-wide response cache, shared by every session."""
+    global _response_cache
+    with _pool_lock:
+        if _response_cache is None:
+            try:
+                _response_cache = ResponseCache(AI_CACHE_PATH)
+            except (OSError, sqlite3.Error):
+                # Unwritable cache location: keep the cache for this process only
+                _response_cache = ResponseCache(":memory:")
+        return _response_cache
+
+
+def get_client(api_key: str = None):
+    """Get configured Gemini client. Uses GOOGLE_API_KEY when no key is given."""
+    api_key = api_key or get_api_key()
+    if api_key:
+        try:
+            return _client_for_key(api_key)
+        except Exception:
+            return None
+    return None
+
+
+def _discover_models(client) -> dict:
+    """List models once and pick one per tier for text generation."""
+    names = []
+    for model in client.models.list():
+        actions = getattr(model, 'supported_actions', None)
+        if actions and 'generateContent' not in actions:
+            continue
+        model_name = model.name if hasattr(model, 'name') else str(model)
+        model_name = model_name.replace('models/', '')
+        if 'gemini' in model_name.lower() and not any(part in model_name.lower() for part in NON_TEXT_MODELS):
+            names.append(model_name)
+    tiers = {}
+    for tier, preferences in MODEL_TIERS.items():
+        matches = [name for part in preferences for name in names if part in name.lower()]
+        # Fallback to any gemini model
+        tiers[tier] = (matches or names or [DEFAULT_MODEL])[0]
+    return tiers
+
+
+@traced()
+def get_available_model(client, api_key: str = None, tier: str = "rewrite") -> str:
+    """Find a model for a tier of MODEL_TIERS (discovery is cached per key for MODEL_CACHE_TTL)."""
+    api_key = api_key or get_api_key()
+    with _pool_lock:
+        lock = _discovery_locks.setdefault(api_key, threading.Lock())
+    # Concurrent first requests for a key wait here instead of listing models twice
+    with lock:
+        cached = _models.get(api_key)
+        if cached and cached[1] > time.monotonic():
+            return cached[0][tier]
+        incr("gemini_requests_total", kind="list")
+        try:
+            with span("model_discovery"):
+                tiers = _discover_models(client)
+        except Exception:
+            # Discovery errors are not cached, so the next call tries again
+            return DEFAULT_MODEL
+        _models[api_key] = (tiers, time.monotonic() + MODEL_CACHE_TTL)
+        return tiers[tier]
+
+
+REWRITE_INSTRUCTIONS = {
+    "passive_voice": "Rewrite this sentence in active voice.",
+    "long_sentence": "Break this into 2-3 shorter, clearer sentences.",
+    "wordy": "Make this more concise.",
+    "complex_words": "Simplify using everyday words.",
+    "weak_words": "Remove filler words and strengthen this.",
+    "hedging": "Make this more confident and direct.",
+    "general": "Improve clarity and impact.",
+}
+
+
+def build_rewrite_prompt(issue_type: str, original: str) -> str:
+    """Single-issue rewrite prompt."""
+    instruction = REWRITE_INSTRUCTIONS.get(issue_type, REWRITE_INSTRUCTIONS["general"])
+    target = "text" if issue_type == "long_sentence" else "sentence"
+    return f"{instruction} Return ONLY the rewritten {target}:\n\n{original}"
+
+
+def build_batch_prompt(issues: list[dict]) -> str:
+    """One prompt covering every flagged sentence, asking for a JSON array of rewrites."""
+    items = [
+        {
+            "id": i,
+            "issue": issue['type'],
+            "instruction": REWRITE_INSTRUCTIONS.get(issue['type'], REWRITE_INSTRUCTIONS["general"]),
+            "text": issue['original'],
+        }
+        for i, issue in enumerate(issues, start=1)
+    ]
+    return f"""You are a helpful writing editor. Rewrite the text of each item below by following its instruction.
+
+Return ONLY a JSON array with one object per item, in this form:
+[{{"id": 1, "rewrite": "the rewritten text"}}]
+
+ITEMS:
+{json.dumps(items, ensure_ascii=False, indent=1)}"""
+
+
+def build_coach_prompt(text: str) -> str:
+    """Whole-document feedback prompt."""
+    return f"""You are a helpful writing coach. Analyze this text and provide friendly, actionable feedback.
+
+For each issue you find:
+1. Quote the problematic text
+2. Explain briefly why it could be improved
+3. Provide a specific rewritten version
+
+Focus on: clarity, conciseness, tone, and impact. Be encouraging!
+
+TEXT:
+{text}
+
+Provide your feedback in a clear, organized format."""
+
+
+PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+
+
+def estimate_tokens(text: str) -> int:
+    """Tokens `text` should take at most, estimated without a request."""
+    return _estimate(len(text), len(text.split()))
+
+
+def _estimate(chars: int, words: int) -> int:
+    return math.ceil(max(chars / CHARS_PER_TOKEN, words * TOKENS_PER_WORD))
+
+
+def check_prompt(prompt: str, kind: str) -> str:
+    """Return `prompt`, or raise PromptTooLarge if its estimate is over MAX_PROMPT_TOKENS."""
+    tokens = estimate_tokens(prompt)
+    if tokens > MAX_PROMPT_TOKENS:
+        incr("oversized_prompts_total", kind=kind)
+        raise PromptTooLarge(f"prompt too long (~{tokens} tokens, limit {MAX_PROMPT_TOKENS})")
+    return prompt
+
+
+def _pieces(text: str, budget: int):
+    """Yield (separator, piece): paragraphs, or the sentences and then the words of those over `budget`."""
+    for paragraph in PARAGRAPH_BREAK.split(text.strip()):
+        separator = "\n\n"
+        for sentence in [paragraph] if estimate_tokens(paragraph) <= budget else SENTENCE_BOUNDARY.split(paragraph):
+            for piece in [sentence] if estimate_tokens(sentence) <= budget else sentence.split():
+                yield separator, piece
+                separator = " "
+
+
+def split_sections(text: str, budget: int = COACH_SECTION_TOKENS) -> list[str]:
+    """Consecutive sections of `text` of at most `budget` estimated tokens each.
+
+    Sections break between paragraphs where possible, then between sentences,
+    and only inside a sentence longer than the budget.
+    """
+    if estimate_tokens(text) <= budget:
+        return [text]
+    sections, current, chars, words = [], [], 0, 0
+    for separator, piece in _pieces(text, budget):
+        # The estimate of the section with this piece, from running totals
+        piece_words = len(piece.split())
+        if current and _estimate(chars + len(separator) + len(piece), words + piece_words) > budget:
+            sections.append("".join(current))
+            current, chars, words = [], 0, 0
+        if current:
+            piece = separator + piece
+        current.append(piece)
+        chars += len(piece)
+        words += piece_words
+    if current:
+        sections.append("".join(current))
+    return sections
+
+
+def coach_sections(text: str) -> list[str]:
+    """The sections to coach `text` in; one means a single request for the whole text."""
+    sections = split_sections(text)
+    if len(sections) > MAX_COACH_SECTIONS:
+        incr("oversized_prompts_total", kind="coach")
+        raise PromptTooLarge(
+            f"document too long for the coach (~{estimate_tokens(text)} tokens, "
+            f"limit {COACH_SECTION_TOKENS * MAX_COACH_SECTIONS})"
+        )
+    return sections
+
+
+def build_section_prompt(section: str, number: int, total: int) -> str:
+    """Feedback prompt for one section of a document coached in parts."""
+    return f"""You are a helpful writing coach reviewing part {number} of {total} of a longer text.
+
+List the most important issues in this part, at most five. For each:
+1. Quote the problematic text
+2. Explain briefly why it could be improved
+3. Provide a specific rewritten version
+
+Focus on: clarity, conciseness, tone, and impact. Be brief; your notes will be merged with those for the other parts.
+
+PART {number} OF {total}:
+{section}"""
+
+
+def build_merge_prompt(notes: list[str]) -> str:
+    """Prompt merging per-section notes into feedback on the whole document."""
+    parts = "\n\n".join(f"NOTES ON PART {n}:\n{note}" for n, note in enumerate(notes, start=1))
+    return f"""You are a helpful writing coach. A longer text was reviewed in {len(notes)} parts; the notes on each part are below.
+
+Merge them into one friendly, actionable piece of feedback on the whole text:
+- Start with the patterns that recur across parts
+- Keep the most important specific issues, each with its quote and rewritten version
+- Drop duplicates
+
+Be encouraging!
+
+{parts}
+
+Provide your feedback in a clear, organized format."""
+
+
+def merged_notes(notes: list[str]) -> str:
+    """Section notes as they are, for when the merge prompt itself would be too long."""
+    return "\n\n".join(f"**Part {n}**\n\n{note}" for n, note in enumerate(notes, start=1))
+
+
+def parse_batch_rewrites(raw: str, count: int) -> list[str]:
+    """Map a batch response back to its items. Unparsed items are None."""
+    rewrites = [None] * count
+    cleaned = raw.strip()
+    if cleaned.startswith("```"):
+        cleaned = cleaned.strip("`").strip()
+        if cleaned.lower().startswith("json"):
+            cleaned = cleaned[4:]
+    try:
+        data = json.loads(cleaned)
+    except ValueError:
+        return rewrites
+    if isinstance(data, dict):
+        data = data.get("rewrites") or data.get("items") or []
+    if not isinstance(data, list):
+        return rewrites
+
+    for item in data:
+        if not isinstance(item, dict):
+            continue
+        item_id, rewrite = item.get("id"), item.get("rewrite")
+        try:
+            item_id = int(item_id)
+        except (TypeError, ValueError):
+            continue
+        if 1 <= item_id <= count and isinstance(rewrite, str) and rewrite.strip():
+            rewrites[item_id - 1] = rewrite.strip()
+    return rewrites
+
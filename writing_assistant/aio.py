@@ -0,0 +1,316 @@
+"""
+Asyncio Gemini backend on the SDK's `client.aio` interface.
+
+Requests run as tasks on one background event loop shared by every session,
+so waiting on the model ties up no thread. A semaphore bounds the requests in
+flight, each attempt has a timeout, and `submit` returns a concurrent Future
+whose `cancel()` stops the task. The app cancels a run's tasks when a rerun
+abandons them, so they stop holding a slot and spending quota.
+
+Key routing, quota, the retry policy, the breakers, the response cache and
+the prompts come from `writing_assistant.ai`.
+"""
+
+import os
+import asyncio
+import threading
+from concurrent.futures import Future
+
+from . import ai
+from .ai import (
+    MAX_PROMPT_TOKENS, RATE_LIMIT_WAIT, RETRY_ATTEMPTS, RateLimited, build_batch_prompt, build_coach_prompt,
+    build_merge_prompt, build_rewrite_prompt, build_section_prompt, can_fail_over, check_prompt,
+    coach_error, coach_sections, estimate_tokens, get_api_keys, get_available_model, get_client,
+    get_response_cache, in_flight, json_response_config, merged_notes, parse_batch_rewrites, pick_key,
+    retry_delay, rewrite_error,
+)
+from .tracing import incr, traced
+
+
+AI_CONCURRENCY = int(os.environ.get("WRITING_ASSISTANT_AI_CONCURRENCY", 8))  # requests in flight, all sessions
+REWRITE_TIMEOUT = 30.0  # seconds per rewrite or batch attempt
+COACH_TIMEOUT = 120.0  # seconds per coach attempt, including the whole stream
+
+
+class AsyncBackend:
+    """Event loop on a daemon thread, with the semaphore bounding requests in flight."""
+
+    def __init__(self, concurrency: int = AI_CONCURRENCY):
+        self.loop = asyncio.new_event_loop()
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.thread = threading.Thread(target=self.loop.run_forever, name="gemini-aio", daemon=True)
+        self.thread.start()
+
+    def submit(self, coro) -> Future:
+        """Schedule `coro` on the loop; cancelling the returned future cancels the task."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> AsyncBackend:
+    """Process-wide backend, started on first use."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = AsyncBackend()
+        return _backend
+
+
+async def _generate(keys: list[str], request, kind: str, timeout: float, can_retry=None):
+    """Await `request(client)` on a key from `keys` within quota, the concurrency limit and `timeout`.
+
+    A throttled call fails over at once to another key when one is available,
+    otherwise it backs off with jitter (`ai.retry_delay`). Raises RateLimited
+    without calling the API while every key's breaker is open. `can_retry`
+    (optional) is checked before each retry, e.g. to avoid replaying a stream
+    that already produced output. Backoff and quota waits sleep on the loop
+    without holding a semaphore slot.
+    """
+    semaphore = get_backend().semaphore
+    tried = set()
+    for attempt in range(RETRY_ATTEMPTS + 1):
+        api_key = pick_key(keys, tried)
+        if api_key is None:
+            raise RateLimited("circuit open")
+        breaker = ai._breaker_for_key(api_key)
+        if not await ai._rate_limiter_for_key(api_key).acquire_async(timeout=RATE_LIMIT_WAIT):
+            raise RateLimited("quota wait timed out")
+        incr("gemini_requests_total", kind=kind)
+        try:
+            async with semaphore:
+                with in_flight(api_key):
+                    result = await asyncio.wait_for(request(ai._client_for_key(api_key)), timeout)
+        except asyncio.TimeoutError:
+            incr("ai_timeouts_total", kind=kind)
+            raise TimeoutError(f"no response after {timeout:g}s") from None
+        except Exception as e:
+            tried.add(api_key)
+            await asyncio.sleep(retry_delay(e, attempt, breaker, can_retry, can_fail_over(keys, tried)))
+        else:
+            breaker.record_success()
+            return result
+
+
+class AsyncSingleFlight:
+    """Coalesces identical concurrent calls: one runs, the others wait and share its outcome.
+
+    Keys are response cache keys, so two sessions rewriting the same sentence for
+    the same issue make one upstream request. The shared call runs as its own
+    task on the backend's loop, so cancelling one caller does not cancel it for
+    the others; it is cancelled once every caller has gone. Nothing is kept once
+    the call ends.
+    """
+
+    def __init__(self):
+        self.calls = {}  # key -> [task, callers waiting]
+
+    async def do(self, key: str, make_coro, kind: str):
+        entry = self.calls.get(key)
+        # A finished call's done-callback may not have run yet; never join it
+        if entry is None or entry[0].done():
+            entry = self.calls[key] = [asyncio.ensure_future(make_coro()), 0]
+            entry[0].add_done_callback(lambda _, entry=entry: self._forget(key, entry))
+        else:
+            incr("coalesced_requests_total", kind=kind)
+        entry[1] += 1
+        try:
+            return await asyncio.shield(entry[0])
+        finally:
+            entry[1] -= 1
+            if not entry[1] and not entry[0].done():
+                # Forget it now: the task only finishes cancelling on a later step,
+                # and a caller arriving before that must start a new call
+                entry[0].cancel()
+                self._forget(key, entry)
+
+    def _forget(self, key: str, entry: list):
+        if self.calls.get(key) is entry:
+            del self.calls[key]
+
+
+_inflight = AsyncSingleFlight()
+
+
+async def _request(keys: list[str], key: str, request, kind: str, timeout: float):
+    """`_generate` behind single-flight, recording token usage once per upstream call."""
+    async def call():
+        response = await _generate(keys, request, kind, timeout)
+        ai._record_usage(getattr(response, "usage_metadata", None), kind)
+        return response
+    return await _inflight.do(key, call, kind)
+
+
+# Blocking helpers run on worker threads so the loop shared by every session
+# never waits on them: the first get_client imports google.genai, and the
+# response cache is SQLite on disk
+
+async def _client_for(api_key: str):
+    return await asyncio.to_thread(get_client, api_key)
+
+
+async def _cache_get(cache, key: str) -> str:
+    return await asyncio.to_thread(cache.get, key)
+
+
+async def _cache_put(cache, key: str, value: str):
+    await asyncio.to_thread(cache.put, key, value)
+
+
+async def _model_for(client, api_key: str, tier: str) -> str:
+    # Discovery lists models synchronously and is cached per key; keep it off the loop
+    return await asyncio.to_thread(get_available_model, client, api_key, tier)
+
+
+@traced("get_batch_suggestions_async")
+async def get_batch_suggestions(issues: list[dict], api_key: str) -> tuple[list[str], str]:
+    """Rewrite every issue with one request. Returns (rewrites, error).
+
+    Items the model skipped or returned malformed come back as None so the caller
+    can retry just those with get_ai_suggestion.
+    """
+    client = await _client_for(api_key)
+    if not client:
+        return [None] * len(issues), "No API key configured"
+
+    # Each item is cached under its single-issue prompt, so both paths share entries
+    model_name = await _model_for(client, api_key, "rewrite")
+    cache = await asyncio.to_thread(get_response_cache)
+    keys = [
+        cache.key("rewrite", model_name, build_rewrite_prompt(issue['type'], issue['original']))
+        for issue in issues
+    ]
+    rewrites = await asyncio.to_thread(lambda: [cache.get(key) for key in keys])
+    pending = [i for i, rewrite in enumerate(rewrites) if rewrite is None]
+    if len(pending) < len(issues):
+        incr("response_cache_total", len(issues) - len(pending), kind="rewrite", result="hit")
+    if not pending:
+        return rewrites, None
+    incr("response_cache_total", len(pending), kind="rewrite", result="miss")
+
+    prompt = build_batch_prompt([issues[i] for i in pending])
+    batch_key = cache.key("batch", model_name, prompt)
+    try:
+        check_prompt(prompt, "batch")
+        response = await _request(get_api_keys(api_key), batch_key, lambda client: client.aio.models.generate_content(
+            model=model_name,
+            contents=prompt,
+            config=json_response_config(),
+        ), "batch", REWRITE_TIMEOUT)
+    except Exception as e:
+        return rewrites, rewrite_error(e)
+
+    for i, rewrite in zip(pending, parse_batch_rewrites(response.text or "", len(pending))):
+        if rewrite:
+            rewrites[i] = rewrite
+            await _cache_put(cache, keys[i], rewrite)
+    return rewrites, None
+
+
+@traced("get_ai_suggestion_async")
+async def get_ai_suggestion(issue_type: str, original: str, api_key: str) -> tuple[str, str]:
+    """Get AI-powered suggestion for a specific issue. Returns (suggestion, error)."""
+    client = await _client_for(api_key)
+    if not client:
+        return None, "No API key configured"
+
+    prompt = build_rewrite_prompt(issue_type, original)
+    model_name = await _model_for(client, api_key, "rewrite")
+    cache = await asyncio.to_thread(get_response_cache)
+    cache_key = cache.key("rewrite", model_name, prompt)
+    cached = await _cache_get(cache, cache_key)
+    incr("response_cache_total", kind="rewrite", result="miss" if cached is None else "hit")
+    if cached is not None:
+        return cached, None
+
+    try:
+        check_prompt(prompt, "rewrite")
+        response = await _request(get_api_keys(api_key), cache_key, lambda client: client.aio.models.generate_content(
+            model=model_name,
+            contents=prompt
+        ), "rewrite", REWRITE_TIMEOUT)
+        suggestion = response.text.strip()
+        await _cache_put(cache, cache_key, suggestion)
+        return suggestion, None
+    except Exception as e:
+        return None, rewrite_error(e)
+
+
+async def _section_note(keys: list[str], model_name: str, prompt: str) -> str:
+    """Feedback on one section, from the cache or one request."""
+    cache = await asyncio.to_thread(get_response_cache)
+    cache_key = cache.key("coach_section", model_name, prompt)
+    cached = await _cache_get(cache, cache_key)
+    incr("response_cache_total", kind="coach_section", result="miss" if cached is None else "hit")
+    if cached is not None:
+        return cached
+    check_prompt(prompt, "coach_section")
+    response = await _request(keys, cache_key, lambda client: client.aio.models.generate_content(
+        model=model_name,
+        contents=prompt
+    ), "coach_section", COACH_TIMEOUT)
+    note = (response.text or "").strip()
+    await _cache_put(cache, cache_key, note)
+    return note
+
+
+@traced("get_full_analysis_async")
+async def get_full_analysis(text: str, on_chunk, api_key: str) -> tuple[str, str]:
+    """Get comprehensive AI analysis, streamed: `on_chunk` gets each piece of text. Returns (analysis, error).
+
+    A document over COACH_SECTION_TOKENS is coached in sections as concurrent
+    tasks, and only the merge of their notes is streamed. The notes are cached
+    per section, so an edit re-sends only the sections it touched; if any
+    section fails the coach fails, with the finished notes already cached.
+    """
+    client = await _client_for(api_key)
+    if not client:
+        return None, "No API key configured"
+
+    prompt = build_coach_prompt(text)
+    model_name = await _model_for(client, api_key, "coach")
+    cache = await asyncio.to_thread(get_response_cache)
+    cache_key = cache.key("coach", model_name, prompt)
+    cached = await _cache_get(cache, cache_key)
+    incr("response_cache_total", kind="coach", result="miss" if cached is None else "hit")
+    if cached is not None:
+        on_chunk(cached)
+        return cached, None
+
+    parts = []
+
+    async def stream(client):
+        usage = None
+        async for chunk in await client.aio.models.generate_content_stream(model=model_name, contents=prompt):
+            # Each chunk carries the running totals; the last one is complete
+            usage = getattr(chunk, "usage_metadata", None) or usage
+            if chunk.text:
+                parts.append(chunk.text)
+                on_chunk(chunk.text)
+        ai._record_usage(usage, "coach")
+        return "".join(parts)
+
+    try:
+        keys = get_api_keys(api_key)
+        sections = coach_sections(text)
+        if len(sections) > 1:
+            notes = await asyncio.gather(*(
+                _section_note(keys, model_name, build_section_prompt(section, n, len(sections)))
+                for n, section in enumerate(sections, start=1)
+            ))
+            prompt = build_merge_prompt(notes)
+            if estimate_tokens(prompt) > MAX_PROMPT_TOKENS:
+                analysis = merged_notes(notes)
+                on_chunk(analysis)
+                await _cache_put(cache, cache_key, analysis)
+                return analysis, None
+        check_prompt(prompt, "coach")
+        # Only retry a stream that failed before producing any text
+        analysis = await _generate(keys, stream, "coach", COACH_TIMEOUT, can_retry=lambda: not parts)
+        analysis = analysis.strip()
+        await _cache_put(cache, cache_key, analysis)
+        return analysis, None
+    except Exception as e:
+        return None, coach_error(e)
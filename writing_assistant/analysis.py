@@ -0,0 +1,462 @@
+"""
+Rule-based analysis core: sentence splitting, the per-sentence scan and
+analyze_text, which runs the rules registered in `writing_assistant.rules`.
+Has no Streamlit or network dependencies so it can run headless.
+
+With `jobs` > 1, large documents are analyzed in sentence shards on a process
+pool; the shards' analyzers are merged in document order, so the result is
+exactly the serial one.
+
+The report keeps the MAX_ISSUES issues of highest priority (see
+`writing_assistant.rules`), ranked in a bounded heap rather than cut off in
+rule order. Every rule sees every sentence either way; ranking only decides
+which issues are built and kept.
+"""
+
+import os
+import re
+import codecs
+import hashlib
+import heapq
+import itertools
+import threading
+import multiprocessing
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, NamedTuple
+
+import numpy as np
+
+from .index import DocumentIndex
+from .readability import ReadabilityStats, ease_score, sentence_counts
+from .rules import (  # noqa: F401 - the tables are re-exported for existing callers
+    COMPLEX_WORDS, HEDGING_WORDS, MAX_ISSUES, RULES, WEAK_SET, WEAK_WORDS, WORDY_PHRASES,
+    PhraseMatcher, rule_matcher,
+)
+from .tracing import incr, span, traced
+
+
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+
+def get_sentences(text: str) -> list[str]:
+    sentences = SENTENCE_BOUNDARY.split(text.strip())
+    return [s.strip() for s in sentences if s.strip()]
+
+
+def get_words(text: str) -> list[str]:
+    return re.findall(r'\b[a-zA-Z]+\b', text.lower())
+
+
+SENTENCE_CACHE_SIZE = 50000  # per-sentence scan results kept across reruns
+
+
+class SentenceFacts(NamedTuple):
+    """Everything the rules need to know about one sentence."""
+    word_count: int
+    weak_count: int
+    syllables: int
+    polysyllables: int
+    content_words: int
+    flags: frozenset  # types of the rules whose pattern matches the sentence
+    phrases: frozenset
+
+
+COUNT_FIELDS = 5  # the leading integer fields of SentenceFacts
+
+
+class SentenceCache:
+    """Thread-safe LRU of SentenceFacts keyed by a hash of the sentence text.
+
+    Streamlit reruns the whole script on every edit; with this cache only new or
+    changed sentences are scanned again.
+    """
+
+    def __init__(self, maxsize: int = SENTENCE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(sentence: str) -> bytes:
+        return hashlib.blake2b(sentence.encode("utf-8"), digest_size=16).digest()
+
+    def facts(self, sentences: list[str], skipped: frozenset = frozenset()) -> list[SentenceFacts]:
+        """Facts for each sentence, scanning only the ones not seen before.
+
+        Pattern rules in `skipped` are not run; facts scanned without them are
+        returned but not cached.
+        """
+        keys = [self.key(sentence) for sentence in sentences]
+        found = {}
+        with self.lock:
+            for key in keys:
+                if key in self.entries and key not in found:
+                    self.entries.move_to_end(key)
+                    found[key] = self.entries[key]
+
+        missing = {}
+        for key, sentence in zip(keys, sentences):
+            if key not in found and key not in missing:
+                missing[key] = sentence
+        if missing:
+            scanned = scan_sentences(list(missing.values()), skipped)
+            found.update(zip(missing, scanned))
+            if skipped:
+                return [found[key] for key in keys]
+            with self.lock:
+                for key, facts in zip(missing, scanned):
+                    self.entries[key] = facts
+                while len(self.entries) > self.maxsize:
+                    self.entries.popitem(last=False)
+
+        return [found[key] for key in keys]
+
+
+@traced("rule_scan")
+def scan_sentences(sentences: list[str], skipped: frozenset = frozenset()) -> list[SentenceFacts]:
+    """Run the per-sentence checks as queries on one index of the whole batch.
+
+    Timed stages: the index, the phrase scan shared by every phrase rule and
+    each pattern rule's pass (`rule_scan:<type>`); the rules' collection of
+    these facts is timed per rule as `rule_collect:<type>`.
+    """
+    with span("document_index"):
+        index = DocumentIndex(sentences)
+
+    phrases = [set() for _ in sentences]
+    with span("phrase_scan"):
+        for phrase, idx, _, _ in rule_matcher().scan(index):
+            phrases[idx].add(phrase)
+
+    flags = [set() for _ in sentences]
+    for rule in RULES:
+        if rule.pattern is not None and rule.type not in skipped:
+            with span(f"rule_scan:{rule.type}"):
+                starts = [m.start() for m in rule.pattern.finditer(index.text)]
+                for idx in set(index.sentence_at(starts, lowered=False).tolist()):
+                    flags[idx].add(rule.type)
+
+    columns = (index.word_counts(), index.count_words(WEAK_SET), *sentence_counts(index))
+    return [
+        SentenceFacts(*counts, frozenset(matched), frozenset(found))
+        for *counts, matched, found in zip(*(c.tolist() for c in columns), flags, phrases)
+    ]
+
+
+SENTENCE_CACHE = SentenceCache()
+
+
+SENTENCE_BATCH = 2000  # sentences scanned together when streaming a file
+UPLOAD_CHUNK_BYTES = 64 * 1024
+# Seconds an analysis should take at most: expensive rules are dropped for
+# documents whose estimated cost exceeds it, and if that is not enough callers
+# that opt in (the app) analyze only the leading part of the document that fits
+ANALYSIS_BUDGET = float(os.environ.get("WRITING_ASSISTANT_ANALYSIS_BUDGET", 5.0))
+BASE_COST = 0.35  # seconds per MB for the index, phrase scan and collection (1 CPU)
+# Worker processes for large documents; 1 analyzes in this process
+ANALYSIS_JOBS = int(os.environ.get("WRITING_ASSISTANT_ANALYSIS_JOBS", 1))
+
+
+def plan_rules(rules: list, size: int, budget: float = ANALYSIS_BUDGET) -> tuple[list, list]:
+    """Split `rules` into those to run on `size` bytes and those skipped.
+
+    Expensive rules are dropped, costliest first, while the estimate exceeds the
+    budget. The estimate depends only on the size, so the plan is deterministic.
+    """
+    megabytes = size / 1_000_000
+    estimate = (BASE_COST + sum(rule.cost for rule in rules)) * megabytes
+    skipped = []
+    for rule in sorted((r for r in rules if r.expensive), key=lambda r: r.cost, reverse=True):
+        if estimate <= budget:
+            break
+        skipped.append(rule)
+        estimate -= rule.cost * megabytes
+    return [rule for rule in rules if rule not in skipped], skipped
+
+
+def size_limit(rules: list, budget: float = ANALYSIS_BUDGET) -> int:
+    """Largest document `rules` are estimated to analyze within `budget`."""
+    return int(budget / (BASE_COST + sum(rule.cost for rule in rules)) * 1_000_000)
+
+
+def encoded_size(text: str) -> int:
+    """Bytes `text` takes in UTF-8; ASCII text is not encoded to tell."""
+    return len(text) if text.isascii() else len(text.encode('utf-8'))
+
+
+def take_within(sentences: Iterable[str], limit: int) -> Iterator[str]:
+    """The leading sentences of a document, up to `limit` bytes in all (UTF-8, one separator per sentence)."""
+    used = 0
+    for sentence in sentences:
+        used += encoded_size(sentence) + 1
+        if used > limit:
+            return
+        yield sentence
+
+
+class TextAnalyzer:
+    """Feeds sentence batches to one instance of every registered rule.
+
+    Rules keep only what the final report needs (first hits and running
+    counts), so a document can be fed in pieces with bounded memory. With a
+    known `size` in bytes, expensive rules that would not fit `budget` are
+    skipped for the whole document and listed in the result. If the rest
+    still would not fit and the caller opted in with `truncate`, `limit` is
+    set: only the leading sentences within it are analyzed (callers stop
+    reading there, see `take_within`; `feed` drops the rest) and the result's
+    'truncated' entry says how much was. Without `truncate` the whole
+    document is analyzed, over budget if need be.
+    """
+
+    def __init__(self, size: int = 0, budget: float = ANALYSIS_BUDGET, rules: list = None,
+                 truncate: bool = False):
+        active, skipped = plan_rules(list(RULES if rules is None else rules), size, budget)
+        self.rules = [rule() for rule in active]
+        self.skipped = frozenset(rule.type for rule in skipped)
+        self.size = size
+        limit = size_limit(active, budget)
+        self.limit = limit if truncate and size > limit else None
+        self.fed_bytes = 0  # UTF-8 bytes fed, counting one separator per sentence
+        self.cut_off = False  # a sentence past the limit was dropped; later ones are too
+        self.sentence_count = 0
+        self.word_count = 0
+        self.readability = ReadabilityStats()
+
+    def feed(self, sentences: list[str]):
+        if self.limit is not None:
+            if self.cut_off:
+                return
+            kept = list(take_within(sentences, self.limit - self.fed_bytes))
+            self.cut_off = len(kept) < len(sentences)
+            sentences = kept
+            if not sentences:
+                return
+        self.fed_bytes += sum(map(encoded_size, sentences)) + len(sentences)
+        sentence_facts = SENTENCE_CACHE.facts(sentences, self.skipped)
+        with span("readability"):
+            counts = np.array([facts[:COUNT_FIELDS] for facts in sentence_facts], dtype=np.int64)
+            word_counts, _, syllables, polysyllables, content_words = counts.reshape(-1, COUNT_FIELDS).T
+            self.readability.feed(word_counts, syllables, polysyllables, content_words)
+        self.sentence_count += len(sentences)
+        self.word_count += int(word_counts.sum())
+        for rule in self.rules:
+            with span(f"rule_collect:{rule.type}"):
+                rule.feed(sentences, sentence_facts)
+
+    def merge(self, other: 'TextAnalyzer'):
+        """Take in an analyzer for the same document fed the sentences right after these."""
+        for rule, other_rule in zip(self.rules, other.rules):
+            rule.merge(other_rule)
+        self.readability.merge(other.readability)
+        self.fed_bytes += other.fed_bytes
+        self.cut_off = self.cut_off or other.cut_off
+        self.sentence_count += other.sentence_count
+        self.word_count += other.word_count
+
+    def top_issues(self, k: int = MAX_ISSUES) -> list[dict]:
+        """The `k` highest-priority issues, highest first; ties go to rule order, then to each rule's own order.
+
+        A bounded min-heap holds the best `k` so far. Rules are visited from the
+        highest ceiling down, and once the heap is full and the next rule's
+        ceiling cannot displace its weakest entry, no remaining rule can either,
+        so their issue lists are not built. This only saves the final step:
+        every rule has already been fed every sentence, since the scores need
+        all of their counts.
+        """
+        # Entries are (priority, -rule position, -issue position, issue); the root is the weakest
+        heap = []
+        order = sorted(range(len(self.rules)), key=lambda i: (-self.rules[i].ceiling(), i))
+        for visited, i in enumerate(order):
+            rule = self.rules[i]
+            if len(heap) == k and (rule.ceiling(), -i, 0) <= heap[0][:3]:
+                incr("rules_pruned_total", len(order) - visited)
+                break
+            found = rule.issues()
+            if rule.cap is not None:
+                found = found[:rule.cap]
+            for j, issue in enumerate(found):
+                entry = (issue['priority'], -i, -j, issue)
+                if len(heap) < k:
+                    heapq.heappush(heap, entry)
+                elif entry[:3] > heap[0][:3]:
+                    heapq.heapreplace(heap, entry)
+        return [entry[3] for entry in sorted(heap, key=lambda entry: entry[:3], reverse=True)]
+
+    def result(self) -> dict:
+        penalties = {'clarity': 0, 'style': 0, 'conciseness': 0, 'tone': 0}
+        for rule in self.rules:
+            penalties[rule.category.lower()] += rule.penalty()
+        with span("rank_issues"):
+            issues = self.top_issues()
+
+        # Clarity also reflects how hard the text is to read overall
+        readability = self.readability.result()
+        scores = {category: max(5, 10 - count * 2) for category, count in penalties.items()}
+        scores['clarity'] = max(5, round((10 - penalties['clarity'] * 2 + ease_score(readability['flesch_reading_ease'])) / 2))
+        scores['overall'] = round(sum(scores.values()) / 4)
+
+        results = {
+            'issues': issues,
+            'scores': scores,
+            'stats': {
+                'words': self.word_count,
+                'sentences': self.sentence_count,
+                'avg_length': round(self.word_count / max(self.sentence_count, 1), 1),
+                **readability,
+            }
+        }
+        if self.skipped:
+            results['skipped_rules'] = sorted(self.skipped)
+        if self.limit is not None:
+            results['truncated'] = {'analyzed': self.fed_bytes, 'total': self.size}
+        return results
+
+
+_executors = {}  # jobs -> process pool
+_executor_lock = threading.Lock()
+
+
+def _pool_context():
+    # Workers must not be forked from the multi-threaded app server: a child
+    # would inherit locks (the tracer's, the sentence cache's) held by other threads
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def get_executor(jobs: int) -> ProcessPoolExecutor:
+    """Process pool of `jobs` workers shared by sharded analyses.
+
+    There is one pool per `jobs` value, kept for the life of the process, so a
+    session asking for a different value never shuts down a pool another
+    session is still submitting to.
+    """
+    with _executor_lock:
+        if jobs not in _executors:
+            _executors[jobs] = ProcessPoolExecutor(max_workers=jobs, mp_context=_pool_context())
+        return _executors[jobs]
+
+
+def analyze_shard(sentences: list[str], size: int) -> TextAnalyzer:
+    """Worker side: one shard of a `size`-byte document, returned unreduced for merging."""
+    analyzer = TextAnalyzer(size=size)
+    analyzer.feed(sentences)
+    return analyzer
+
+
+@traced()
+def analyze_shards(shards: Iterable[list[str]], size: int, jobs: int, truncate: bool = False) -> TextAnalyzer:
+    """Analyze consecutive sentence shards on `jobs` processes and merge them in order.
+
+    At most two shards per worker are in flight, so a streamed document is not
+    read ahead of the pool. Every shard plans its rules from the whole
+    document's `size`, so they all skip the same ones. With `truncate`, the
+    shards must already stop at the limit; the merged analyzer reports it.
+    """
+    executor = get_executor(jobs)
+    analyzer = TextAnalyzer(size=size, truncate=truncate)
+    pending = deque()
+    for shard in shards:
+        pending.append(executor.submit(analyze_shard, shard, size))
+        if len(pending) >= 2 * jobs:
+            analyzer.merge(pending.popleft().result())
+    while pending:
+        analyzer.merge(pending.popleft().result())
+    return analyzer
+
+
+@traced()
+def analyze_text(text: str, jobs: int = ANALYSIS_JOBS, truncate: bool = False) -> dict:
+    """Analyze text for issues, on `jobs` processes when it has more than one shard of sentences.
+
+    With `truncate`, a document too large for the time budget is analyzed
+    only as far as it fits (see TextAnalyzer).
+    """
+    # Sized in UTF-8 bytes, like an uploaded file, so both plan the same way
+    size = encoded_size(text)
+    analyzer = TextAnalyzer(size=size, truncate=truncate)
+    with span("split_sentences"):
+        if analyzer.limit is None:
+            sentences = get_sentences(text)
+        else:
+            # Split only as far as the part that is analyzed
+            sentences = list(take_within(iter_sentences([text]), analyzer.limit))
+    if jobs > 1 and len(sentences) > SENTENCE_BATCH:
+        shards = (sentences[i:i + SENTENCE_BATCH] for i in range(0, len(sentences), SENTENCE_BATCH))
+        return analyze_shards(shards, size, jobs, truncate).result()
+    analyzer.feed(sentences)
+    return analyzer.result()
+
+
+def iter_text_chunks(stream, chunk_size: int = UPLOAD_CHUNK_BYTES) -> Iterator[str]:
+    """Decode a UTF-8 byte stream piece by piece."""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    while True:
+        data = stream.read(chunk_size)
+        if not data:
+            break
+        chunk = decoder.decode(data)
+        if chunk:
+            yield chunk
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+def iter_sentences(chunks: Iterable[str]) -> Iterator[str]:
+    """Split streamed text into the same sentences get_sentences would return."""
+    buffer = ''
+    for chunk in chunks:
+        buffer += chunk
+        start = 0
+        for match in SENTENCE_BOUNDARY.finditer(buffer):
+            sentence = buffer[start:match.start()].strip()
+            if sentence:
+                yield sentence
+            start = match.end()
+        buffer = buffer[start:]
+    sentence = buffer.strip()
+    if sentence:
+        yield sentence
+
+
+def stream_size(stream) -> int:
+    """Bytes left in a seekable stream, or 0 when that cannot be told."""
+    try:
+        position = stream.tell()
+        size = stream.seek(0, os.SEEK_END) - position
+        stream.seek(position)
+        return size
+    except (AttributeError, OSError, ValueError):
+        return 0
+
+
+def iter_batches(sentences: Iterable[str], size: int = SENTENCE_BATCH) -> Iterator[list[str]]:
+    """Consecutive lists of `size` sentences, the last one shorter; none for no sentences."""
+    batch = []
+    for sentence in sentences:
+        batch.append(sentence)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+@traced()
+def analyze_stream(stream, jobs: int = ANALYSIS_JOBS, truncate: bool = False) -> dict:
+    """Analyze a UTF-8 file object without holding the decoded document in memory; `truncate` as for analyze_text."""
+    size = stream_size(stream)
+    analyzer = TextAnalyzer(size=size, truncate=truncate)
+    sentences = iter_sentences(iter_text_chunks(stream))
+    if analyzer.limit is not None:
+        sentences = take_within(sentences, analyzer.limit)
+    batches = iter_batches(sentences)
+    # Like analyze_text, use the pool only for more than one shard of sentences
+    leading = list(itertools.islice(batches, 2))
+    batches = itertools.chain(leading, batches)
+    if jobs > 1 and len(leading) > 1:
+        return analyze_shards(batches, size, jobs, truncate).result()
+    for batch in batches:
+        analyzer.feed(batch)
+    return analyzer.result()
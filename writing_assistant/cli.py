@@ -0,0 +1,118 @@
+"""
+Headless batch mode: run the rule-based analyzer over many documents.
+
+    python -m writing_assistant docs/ "drafts/**/*.md" -o results.jsonl --jobs 8
+    python -m writing_assistant docs/ --scaling
+
+Every document is analyzed in full. With --truncate, a document too large for
+the time budget is analyzed only as far as it fits; its record says so under
+"truncated" and a note goes to stderr.
+"""
+
+import argparse
+import functools
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .analysis import analyze_stream
+
+TEXT_SUFFIXES = ('.txt', '.md')
+
+
+def collect_paths(targets: list[str]) -> list[str]:
+    """Expand directories (recursively, .txt/.md only) and glob patterns into file paths."""
+    paths = []
+    for target in targets:
+        if os.path.isdir(target):
+            for root, dirs, files in os.walk(target):
+                dirs.sort()
+                paths.extend(os.path.join(root, name) for name in sorted(files)
+                             if name.endswith(TEXT_SUFFIXES))
+        else:
+            paths.extend(match for match in sorted(glob.glob(target, recursive=True))
+                         if os.path.isfile(match))
+    return list(dict.fromkeys(paths))
+
+
+def analyze_file(path: str, jobs: int = 1, truncate: bool = False) -> dict:
+    """Analyze one file, sharded over `jobs` processes. Read errors are reported in the record instead of raised."""
+    try:
+        with open(path, 'rb') as f:
+            return {'path': path, **analyze_stream(f, jobs, truncate)}
+    except (OSError, UnicodeDecodeError) as e:
+        return {'path': path, 'error': str(e)}
+
+
+def write_record(record: dict, out):
+    if not out:
+        return
+    out.write(json.dumps(record, ensure_ascii=False) + '\n')
+    if 'truncated' in record:
+        truncated = record['truncated']
+        print(f"{record['path']}: truncated, analyzed the first {truncated['analyzed']:,} "
+              f"of {truncated['total']:,} bytes", file=sys.stderr)
+
+
+def run(paths: list[str], jobs: int, out=None, truncate: bool = False) -> float:
+    """Analyze `paths` on `jobs` processes, writing JSONL to `out`. Returns elapsed seconds."""
+    start = time.perf_counter()
+    if len(paths) == 1 and jobs > 1:
+        # One document: shard its sentences over the workers instead
+        write_record(analyze_file(paths[0], jobs, truncate), out)
+    elif jobs <= 1:
+        for path in paths:
+            write_record(analyze_file(path, truncate=truncate), out)
+    else:
+        chunksize = max(1, len(paths) // (jobs * 4))
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            # map keeps input order, so output is deterministic
+            for record in executor.map(functools.partial(analyze_file, truncate=truncate), paths, chunksize=chunksize):
+                write_record(record, out)
+    return time.perf_counter() - start
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m writing_assistant',
+        description='Analyze .txt/.md documents and write one JSON result per line.',
+    )
+    parser.add_argument('targets', nargs='+', help='files, directories or glob patterns')
+    parser.add_argument('-o', '--output', default='-', help='JSONL output file (default: stdout)')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help='worker processes (default: number of CPUs)')
+    parser.add_argument('--scaling', action='store_true',
+                        help='time the corpus at 1, 2, 4, ... up to --jobs workers instead of writing results')
+    parser.add_argument('--truncate', action='store_true',
+                        help='analyze documents too large for WRITING_ASSISTANT_ANALYSIS_BUDGET only as far as '
+                             'it allows (marked "truncated" in their records)')
+    args = parser.parse_args(argv)
+
+    paths = collect_paths(args.targets)
+    if not paths:
+        print('No documents found.', file=sys.stderr)
+        return 1
+
+    if args.scaling:
+        counts = []
+        n = 1
+        while n < args.jobs:
+            counts.append(n)
+            n *= 2
+        counts.append(args.jobs)
+        for jobs in counts:
+            elapsed = run(paths, jobs)
+            print(f'{jobs:>3} workers  {len(paths) / elapsed:10.1f} docs/sec', file=sys.stderr)
+        return 0
+
+    if args.output == '-':
+        elapsed = run(paths, args.jobs, sys.stdout, args.truncate)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as out:
+            elapsed = run(paths, args.jobs, out, args.truncate)
+    print(f'Analyzed {len(paths)} documents in {elapsed:.2f}s '
+          f'({len(paths) / elapsed:.1f} docs/sec, {args.jobs} workers)', file=sys.stderr)
+    return 0
@@ -0,0 +1,107 @@
+"""
+Compact token and sentence index for a batch of sentences.
+
+The batch is tokenized once, with the same tokens as `get_words`, into flat
+arrays: token offsets, the sentence each token belongs to and an integer id
+per distinct lowercased token. The rules query these arrays instead of
+re-tokenizing and copying every sentence.
+"""
+
+import re
+
+import numpy as np
+
+
+# Joins the sentences of a batch: not a word or space character, and in no
+# phrase, so nothing can match across a sentence boundary
+SEPARATOR = '\x00'
+STAND_IN = '\x01'  # replaces a SEPARATOR inside a sentence; matches the same patterns
+WORD = re.compile(r'\b[a-z]+\b')  # get_words, on text that is already lowercased
+
+LETTER_BYTES = np.zeros(256, dtype=bool)
+LETTER_BYTES[ord('a'):ord('z') + 1] = True
+WORD_BYTES = LETTER_BYTES.copy()  # ASCII characters that \w matches
+WORD_BYTES[ord('A'):ord('Z') + 1] = True
+WORD_BYTES[ord('0'):ord('9') + 1] = True
+WORD_BYTES[ord('_')] = True
+
+
+def _offsets(lengths: np.ndarray) -> np.ndarray:
+    """Start of each piece when pieces of `lengths` are joined with one separator."""
+    starts = np.zeros(len(lengths), dtype=np.int64)
+    np.cumsum(lengths[:-1] + 1, out=starts[1:])
+    return starts
+
+
+class DocumentIndex:
+    """Token and sentence offsets for `sentences`, built in a single pass.
+
+    `text` and `lowered` are the sentences joined with SEPARATOR, as written and
+    lowercased; token offsets refer to `lowered`.
+    """
+
+    __slots__ = ('sentences', 'text', 'lowered', 'text_starts', 'sentence_starts',
+                 'token_starts', 'token_ends', 'token_sentence', 'token_ids', 'vocab', 'words')
+
+    def __init__(self, sentences: list[str]):
+        self.sentences = sentences
+        self.text = SEPARATOR.join(sentences)
+        if self.text.count(SEPARATOR) != max(len(sentences) - 1, 0):
+            self.text = SEPARATOR.join(s.replace(SEPARATOR, STAND_IN) for s in sentences)
+            sentences = self.text.split(SEPARATOR)
+        lowered = [s.lower() for s in sentences]
+        self.lowered = SEPARATOR.join(lowered)
+        self.text_starts = _offsets(np.fromiter(map(len, sentences), dtype=np.int64, count=len(sentences)))
+        self.sentence_starts = _offsets(np.fromiter(map(len, lowered), dtype=np.int64, count=len(lowered)))
+
+        offset_type = np.int32 if len(self.lowered) < 2 ** 31 else np.int64
+        tokens = WORD.findall(self.lowered)
+        if self.lowered.isascii():
+            self.token_starts, self.token_ends = self._ascii_spans(self.lowered, offset_type)
+        else:
+            spans = np.array([m.span() for m in WORD.finditer(self.lowered)], dtype=offset_type).reshape(-1, 2)
+            self.token_starts, self.token_ends = spans[:, 0], spans[:, 1]
+        self.token_sentence = (np.searchsorted(self.sentence_starts, self.token_starts, side='right') - 1).astype(np.int32)
+
+        self.vocab = {token: i for i, token in enumerate(dict.fromkeys(tokens))}
+        self.words = list(self.vocab)  # id -> token
+        self.token_ids = np.fromiter(map(self.vocab.__getitem__, tokens), dtype=np.int32, count=len(tokens))
+
+    @staticmethod
+    def _ascii_spans(text: str, offset_type) -> tuple[np.ndarray, np.ndarray]:
+        """Token spans without a Python loop: letter runs with no word character either side."""
+        data = np.frombuffer(text.encode('ascii'), dtype=np.uint8)
+        letter = LETTER_BYTES[data]
+        word = WORD_BYTES[data]
+        run_start = np.flatnonzero(letter & ~np.concatenate(([False], letter[:-1])))
+        run_end = np.flatnonzero(letter & ~np.concatenate((letter[1:], [False]))) + 1
+        bounded = (
+            ((run_start == 0) | ~word[np.maximum(run_start - 1, 0)])
+            & ((run_end == len(data)) | ~word[np.minimum(run_end, len(data) - 1)])
+        )
+        return run_start[bounded].astype(offset_type), run_end[bounded].astype(offset_type)
+
+    def __len__(self) -> int:
+        return len(self.sentences)
+
+    def word_counts(self) -> np.ndarray:
+        """Tokens per sentence."""
+        return np.bincount(self.token_sentence, minlength=len(self))
+
+    def count_words(self, words) -> np.ndarray:
+        """Occurrences per sentence of any of `words`."""
+        ids = [self.vocab[w] for w in words if w in self.vocab]
+        if not ids:
+            return np.zeros(len(self), dtype=np.int64)
+        return np.bincount(self.token_sentence[np.isin(self.token_ids, ids)], minlength=len(self))
+
+    def sum_by_word(self, values: np.ndarray) -> np.ndarray:
+        """Per-sentence sums of a value given per vocabulary id."""
+        if not len(values):
+            return np.zeros(len(self), dtype=values.dtype)
+        return np.bincount(self.token_sentence, weights=values[self.token_ids], minlength=len(self)).astype(values.dtype)
+
+    def sentence_at(self, offsets, lowered: bool = True) -> np.ndarray:
+        """Sentence index for offsets into `lowered` (or into `text`)."""
+        starts = self.sentence_starts if lowered else self.text_starts
+        return np.searchsorted(starts, offsets, side='right') - 1
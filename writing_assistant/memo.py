@@ -0,0 +1,93 @@
+"""
+Whole-document memo: analysis results and their AI output, keyed by a hash of
+the input and the options it was analyzed with.
+
+Streamlit reruns the script on every widget change; with this cache a rerun
+whose input did not change redraws from memory instead of analyzing again and
+calling the model again.
+"""
+
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+from .tracing import incr
+
+
+RESULT_CACHE_BYTES = int(os.environ.get("WRITING_ASSISTANT_RESULT_CACHE_BYTES", 64 * 1024 * 1024))
+
+
+class ResultCache:
+    """Thread-safe LRU of JSON-serializable entries, bounded by their encoded size."""
+
+    def __init__(self, max_bytes: int = RESULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> (value, size)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(content, **flags) -> str:
+        """Hash of the document (str or bytes) and the options it is analyzed with."""
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        h = hashlib.blake2b(content, digest_size=16)
+        h.update(repr(sorted(flags.items())).encode("utf-8"))
+        return h.hexdigest()
+
+    @staticmethod
+    def size(value) -> int:
+        return len(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+
+    def get(self, key: str):
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.entries.move_to_end(key)
+        incr("result_cache_total", result="miss" if item is None else "hit")
+        return None if item is None else item[0]
+
+    def put(self, key: str, value):
+        size = self.size(value)
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            if size > self.max_bytes:
+                return
+            self.entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+# Shared by every session: entries depend only on the input and its options
+RESULT_CACHE = ResultCache()
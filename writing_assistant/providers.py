@@ -0,0 +1,199 @@
+"""
+Rewrite and coach providers behind one interface.
+
+`GeminiProvider` calls Gemini through the asyncio backend, `LocalProvider`
+answers from the rules' deterministic rewrites with no network at all (for
+air-gapped installs), and `HTTPProvider` talks to any server speaking the JSON
+protocol of `writing_assistant.server`, such as its local stand-in.
+WRITING_ASSISTANT_PROVIDER picks one; every call is timed per provider as the
+stage `<provider>_<call>`.
+"""
+
+import os
+import json
+import asyncio
+import threading
+import urllib.request
+
+from . import aio
+from .ai import coach_error, rewrite_error
+from .analysis import analyze_text
+from .rules import RULES, rewrite_sentence
+from .tracing import incr, span
+
+
+PROVIDER = os.environ.get("WRITING_ASSISTANT_PROVIDER", "gemini")
+PROVIDER_URL = os.environ.get("WRITING_ASSISTANT_PROVIDER_URL", "http://127.0.0.1:8765")
+
+
+class Provider:
+    """Base class: subclasses implement `_batch`, `_rewrite` and `_coach`.
+
+    The public methods match the `aio` functions: they return (result, error)
+    and never raise for a failed request.
+    """
+
+    name = None
+    needs_key = False  # whether requests need a Google API key
+
+    async def get_batch_suggestions(self, issues: list[dict], api_key: str = None) -> tuple[list[str], str]:
+        """Rewrite every issue in one call. Items without a rewrite come back as None."""
+        with span(f"{self.name}_batch"):
+            return await self._batch(issues, api_key)
+
+    async def get_ai_suggestion(self, issue_type: str, original: str, api_key: str = None) -> tuple[str, str]:
+        """Rewrite one flagged sentence. Returns (suggestion, error)."""
+        with span(f"{self.name}_rewrite"):
+            return await self._rewrite(issue_type, original, api_key)
+
+    async def get_full_analysis(self, text: str, on_chunk, api_key: str = None) -> tuple[str, str]:
+        """Whole-document feedback; `on_chunk` gets each piece of text as it is ready."""
+        with span(f"{self.name}_coach"):
+            return await self._coach(text, on_chunk, api_key)
+
+    async def _batch(self, issues, api_key):
+        raise NotImplementedError
+
+    async def _rewrite(self, issue_type, original, api_key):
+        raise NotImplementedError
+
+    async def _coach(self, text, on_chunk, api_key):
+        raise NotImplementedError
+
+
+class GeminiProvider(Provider):
+    name = "gemini"
+    needs_key = True
+
+    async def _batch(self, issues, api_key):
+        return await aio.get_batch_suggestions(issues, api_key)
+
+    async def _rewrite(self, issue_type, original, api_key):
+        return await aio.get_ai_suggestion(issue_type, original, api_key)
+
+    async def _coach(self, text, on_chunk, api_key):
+        return await aio.get_full_analysis(text, on_chunk, api_key)
+
+
+NO_LOCAL_REWRITE = "No rule-based rewrite for this sentence"
+
+
+def local_batch(issues: list[dict]) -> list[str]:
+    return [rewrite_sentence(issue['type'], issue['original']) for issue in issues]
+
+
+def local_coach(text: str) -> list[str]:
+    """Feedback built from the analyzer's report, as sections for streaming."""
+    results = analyze_text(text)
+    scores = results['scores']
+    sections = [
+        "Here is what stood out, with a rewrite for each point.\n\n"
+        + ", ".join(f"{category.capitalize()} {score}/10" for category, score in scores.items()) + "\n"
+    ]
+    advice = {rule.type: rule.advice for rule in RULES}
+    for n, issue in enumerate(results['issues'], start=1):
+        rewrite = rewrite_sentence(issue['type'], issue['original']) or issue.get('fallback')
+        section = f"\n{n}. \"{issue['original']}\"\n   {issue['issue']}. {advice.get(issue['type']) or ''}".rstrip()
+        if rewrite:
+            section += f"\n   Try: {rewrite}"
+        sections.append(section + "\n")
+    if not results['issues']:
+        sections.append("\nNothing to fix: the text is clear and direct. Nice work!\n")
+    return sections
+
+
+class LocalProvider(Provider):
+    """Rule-driven rewrites and feedback, computed in process."""
+
+    name = "local"
+
+    async def _batch(self, issues, api_key):
+        return local_batch(issues), None
+
+    async def _rewrite(self, issue_type, original, api_key):
+        suggestion = rewrite_sentence(issue_type, original)
+        return suggestion, None if suggestion else NO_LOCAL_REWRITE
+
+    async def _coach(self, text, on_chunk, api_key):
+        # Analysis is CPU-bound; keep it off the event loop
+        sections = await asyncio.to_thread(local_coach, text)
+        for section in sections:
+            on_chunk(section)
+        return "".join(sections).strip(), None
+
+
+class HTTPProvider(Provider):
+    """Client for the `writing_assistant.server` protocol: JSON POSTs under /v1/."""
+
+    name = "http"
+
+    def __init__(self, url: str = PROVIDER_URL):
+        self.url = url.rstrip("/")
+
+    def _post(self, path: str, payload: dict, timeout: float) -> dict:
+        request = urllib.request.Request(
+            f"{self.url}/v1/{path}",
+            data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        incr("provider_requests_total", provider=self.name, kind=path)
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.load(response)
+
+    async def _call(self, path: str, payload: dict, timeout: float) -> dict:
+        # URLError and timeouts are OSErrors, a malformed body a ValueError; callers report both
+        data = await asyncio.to_thread(self._post, path, payload, timeout)
+        if not isinstance(data, dict):
+            raise ValueError(f"expected a JSON object from /v1/{path}, got {type(data).__name__}")
+        return data
+
+    async def _batch(self, issues, api_key):
+        try:
+            data = await self._call("batch", {"issues": issues}, aio.REWRITE_TIMEOUT)
+        except (OSError, ValueError) as e:
+            return [None] * len(issues), rewrite_error(e)
+        rewrites = data.get("rewrites") or []
+        if not isinstance(rewrites, list):
+            return [None] * len(issues), rewrite_error(ValueError("\"rewrites\" is not a list"))
+        return [
+            rewrites[i] if i < len(rewrites) and isinstance(rewrites[i], str) else None
+            for i in range(len(issues))
+        ], None
+
+    async def _rewrite(self, issue_type, original, api_key):
+        try:
+            data = await self._call("rewrite", {"type": issue_type, "original": original}, aio.REWRITE_TIMEOUT)
+        except (OSError, ValueError) as e:
+            return None, rewrite_error(e)
+        suggestion, error = data.get("suggestion"), data.get("error")
+        if not isinstance(suggestion, str):
+            return None, str(error) if error else rewrite_error(ValueError('no "suggestion" in the response'))
+        return suggestion, str(error) if error else None
+
+    async def _coach(self, text, on_chunk, api_key):
+        try:
+            data = await self._call("coach", {"text": text}, aio.COACH_TIMEOUT)
+        except (OSError, ValueError) as e:
+            return None, coach_error(e)
+        analysis, error = data.get("analysis"), data.get("error")
+        if not isinstance(analysis, str) or not analysis:
+            return None, str(error) if error else coach_error(ValueError('no "analysis" in the response'))
+        on_chunk(analysis)
+        return analysis, str(error) if error else None
+
+
+PROVIDERS = {provider.name: provider for provider in (GeminiProvider, LocalProvider, HTTPProvider)}
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def get_provider(name: str = None) -> Provider:
+    """Shared provider instance; `name` defaults to WRITING_ASSISTANT_PROVIDER."""
+    name = name or PROVIDER
+    if name not in PROVIDERS:
+        raise ValueError(f"unknown provider {name!r}; expected one of {', '.join(PROVIDERS)}")
+    with _providers_lock:
+        if name not in _providers:
+            _providers[name] = PROVIDERS[name]()
+        return _providers[name]
@@ -0,0 +1,134 @@
+"""
+Readability statistics computed with NumPy over whole batches of tokens.
+
+Per-word values (syllables, function word or not) are computed once per
+distinct word of a DocumentIndex and summed per sentence with bincount; the
+document indices come from the per-sentence totals, so a book-length input
+costs a few vector operations after tokenization.
+"""
+
+import math
+
+import numpy as np
+
+from .index import DocumentIndex
+
+VOWELS = np.zeros(256, dtype=bool)
+VOWELS[list(b"aeiouy")] = True
+
+# Function words; everything else counts as a content word for lexical density
+FUNCTION_WORDS = frozenset({
+    'a', 'about', 'above', 'after', 'again', 'against', 'all', 'am', 'an', 'and', 'any',
+    'are', 'as', 'at', 'be', 'because', 'been', 'before', 'being', 'below', 'between',
+    'both', 'but', 'by', 'can', 'could', 'did', 'do', 'does', 'doing', 'down', 'during',
+    'each', 'either', 'every', 'few', 'for', 'from', 'further', 'had', 'has', 'have',
+    'having', 'he', 'her', 'here', 'hers', 'herself', 'him', 'himself', 'his', 'how',
+    'i', 'if', 'in', 'into', 'is', 'it', 'its', 'itself', 'just', 'may', 'me', 'might',
+    'more', 'most', 'must', 'my', 'myself', 'neither', 'no', 'nor', 'not', 'of', 'off',
+    'on', 'once', 'only', 'or', 'other', 'our', 'ours', 'ourselves', 'out', 'over',
+    'own', 'same', 'shall', 'she', 'should', 'so', 'some', 'such', 'than', 'that', 'the',
+    'their', 'theirs', 'them', 'themselves', 'then', 'there', 'these', 'they', 'this',
+    'those', 'through', 'to', 'too', 'under', 'until', 'up', 'upon', 'us', 'very', 'was',
+    'we', 'were', 'what', 'when', 'where', 'which', 'while', 'who', 'whom', 'whose',
+    'why', 'will', 'with', 'would', 'you', 'your', 'yours', 'yourself', 'yourselves',
+})
+
+LENGTH_BINS = (0, 10, 20, 30, 40)  # sentence length histogram edges, last bin open
+PLAIN_ENGLISH_EASE = 60  # Flesch reading ease at which clarity is no longer penalized
+
+
+def syllable_counts(words: list[str]) -> np.ndarray:
+    """Estimated syllables per word: vowel groups, minus a silent final "e", at least 1."""
+    if not words:
+        return np.zeros(0, dtype=np.int32)
+    lengths = np.fromiter(map(len, words), dtype=np.int64, count=len(words))
+    starts = np.zeros(len(words), dtype=np.int64)
+    np.cumsum(lengths[:-1], out=starts[1:])
+    ends = starts + lengths
+    letters = np.frombuffer("".join(words).encode("ascii"), dtype=np.uint8)
+
+    vowel = VOWELS[letters]
+    group_start = vowel.copy()
+    group_start[1:] &= ~vowel[:-1]
+    group_start[starts] = vowel[starts]  # a vowel group never spans two words
+    counts = np.add.reduceat(group_start.astype(np.int32), starts)
+
+    last = letters[ends - 1]
+    before_last = letters[np.maximum(ends - 2, starts)]
+    silent_e = (last == ord('e')) & (before_last != ord('l')) & (lengths > 2) & (counts > 1)
+    counts -= silent_e
+    return np.maximum(counts, 1)
+
+
+def sentence_counts(index: DocumentIndex) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Syllables, words of three or more syllables and content words, per sentence."""
+    syllables = syllable_counts(index.words)
+    content = np.fromiter((w not in FUNCTION_WORDS for w in index.words), dtype=np.int32, count=len(index.words))
+    return (
+        index.sum_by_word(syllables),
+        index.sum_by_word((syllables >= 3).astype(np.int32)),
+        index.sum_by_word(content),
+    )
+
+
+class ReadabilityStats:
+    """Accumulates token statistics for a document fed in sentence batches."""
+
+    def __init__(self):
+        self.sentence_lengths = []  # one int array per batch
+        self.words = 0
+        self.syllables = 0
+        self.polysyllables = 0  # words of three or more syllables
+        self.content_words = 0
+
+    def feed(self, word_counts, syllables, polysyllables, content_words):
+        """Add a batch of sentences, given as per-sentence count arrays."""
+        self.sentence_lengths.append(np.asarray(word_counts))
+        self.words += int(np.sum(word_counts))
+        self.syllables += int(np.sum(syllables))
+        self.polysyllables += int(np.sum(polysyllables))
+        self.content_words += int(np.sum(content_words))
+
+    def merge(self, other: 'ReadabilityStats'):
+        """Add the statistics of the sentences that follow these."""
+        self.sentence_lengths.extend(other.sentence_lengths)
+        self.words += other.words
+        self.syllables += other.syllables
+        self.polysyllables += other.polysyllables
+        self.content_words += other.content_words
+
+    def result(self) -> dict:
+        lengths = np.concatenate(self.sentence_lengths) if self.sentence_lengths else np.zeros(0, dtype=np.int64)
+        sentences = len(lengths)
+        histogram = np.bincount(np.searchsorted(LENGTH_BINS, lengths, side='right') - 1, minlength=len(LENGTH_BINS))
+        labels = [f"{lo}-{hi - 1}" for lo, hi in zip(LENGTH_BINS, LENGTH_BINS[1:])] + [f"{LENGTH_BINS[-1]}+"]
+        stats = {
+            'syllables': self.syllables,
+            'lexical_density': round(self.content_words / self.words, 3) if self.words else 0.0,
+            'sentence_lengths': {
+                'median': float(np.median(lengths)) if sentences else 0.0,
+                'p90': float(np.percentile(lengths, 90)) if sentences else 0.0,
+                'stdev': round(float(lengths.std()), 1) if sentences else 0.0,
+                'max': int(lengths.max()) if sentences else 0,
+                'histogram': dict(zip(labels, histogram.tolist())),
+            },
+            'flesch_reading_ease': None,
+            'flesch_kincaid_grade': None,
+            'gunning_fog': None,
+            'smog': None,
+        }
+        if self.words and sentences:
+            words_per_sentence = self.words / sentences
+            syllables_per_word = self.syllables / self.words
+            stats['flesch_reading_ease'] = round(206.835 - 1.015 * words_per_sentence - 84.6 * syllables_per_word, 1)
+            stats['flesch_kincaid_grade'] = round(0.39 * words_per_sentence + 11.8 * syllables_per_word - 15.59, 1)
+            stats['gunning_fog'] = round(0.4 * (words_per_sentence + 100 * self.polysyllables / self.words), 1)
+            stats['smog'] = round(1.043 * math.sqrt(self.polysyllables * 30 / sentences) + 3.1291, 1)
+        return stats
+
+
+def ease_score(flesch_reading_ease) -> int:
+    """1-10 clarity score from reading ease: 10 at plain English, one point per 10 below."""
+    if flesch_reading_ease is None:
+        return 10
+    return int(min(10, max(1, 10 - (PLAIN_ENGLISH_EASE - flesch_reading_ease) // 10)))
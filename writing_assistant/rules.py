@@ -0,0 +1,592 @@
+"""
+Rule tables and the rule registry.
+
+Each rule is a Rule subclass that declares its issue type, category, issue
+cap, precompiled patterns and fallback rewrite. TextAnalyzer creates one
+instance of every registered rule per document and feeds it the sentence
+batches with their SentenceFacts; the rule keeps only the hits it reports.
+A rule fed one part of a document can `merge` the rule fed the part after
+it, which is how sharded analysis combines its shards.
+
+Every issue carries a `priority`, its rule's severity raised by how much of
+the document the problem covers; `ceiling` bounds a rule's priorities from
+its running state, so the analyzer can rank issues without building all of
+them.
+
+Rules also carry a deterministic `rewrite` of a flagged sentence and the
+`advice` behind it, which the local provider serves instead of a model.
+"""
+
+import re
+import math
+import heapq
+from collections import Counter
+from itertools import chain
+
+from .index import DocumentIndex
+
+
+MAX_ISSUES = 8  # issues shown per analysis
+LONG_SENTENCE_WORDS = 30
+
+WORDY_PHRASES = {
+    'in order to': 'to', 'due to the fact that': 'because',
+    'at this point in time': 'now', 'in the event that': 'if',
+    'for the purpose of': 'to', 'at the present time': 'now',
+    'in the near future': 'soon', 'has the ability to': 'can',
+    'is able to': 'can', 'a large number of': 'many',
+    'the majority of': 'most', 'in close proximity to': 'near',
+    'take into consideration': 'consider', 'make a decision': 'decide',
+}
+
+COMPLEX_WORDS = {
+    'utilize': 'use', 'implement': 'start', 'facilitate': 'help',
+    'leverage': 'use', 'optimize': 'improve', 'methodology': 'method',
+    'functionality': 'feature', 'subsequently': 'then',
+    'approximately': 'about', 'commence': 'begin', 'terminate': 'end',
+    'endeavor': 'try', 'sufficient': 'enough', 'numerous': 'many',
+}
+
+WEAK_WORDS = ['very', 'really', 'quite', 'rather', 'somewhat',
+              'basically', 'actually', 'literally', 'just']
+
+HEDGING_WORDS = ['maybe', 'perhaps', 'possibly', 'might', 'could be',
+                 'seems like', 'sort of', 'kind of', 'I think', 'I believe']
+
+WEAK_SET = frozenset(WEAK_WORDS)
+
+# Hedges the local rewrite drops. Hedges bound up with the verb ("could be",
+# "seems like", "might") are left alone: replacing them would need the
+# subject's number and tense ("These could be" is not "These is")
+HEDGE_REWRITES = (
+    'i think that', 'i believe that', 'i think', 'i believe',
+    'maybe', 'perhaps', 'possibly', 'sort of', 'kind of',
+)
+
+# Object and subject forms of the pronouns passive rewrites swap around
+SUBJECT_PRONOUNS = {'me': 'I', 'him': 'he', 'her': 'she', 'us': 'we', 'them': 'they'}
+OBJECT_PRONOUNS = {'i': 'me', 'he': 'him', 'she': 'her', 'we': 'us', 'they': 'them'}
+# Sentence-initial words that are lowercased when they move into the sentence
+LOWERCASE_LEADS = frozenset({
+    'a', 'an', 'the', 'this', 'that', 'these', 'those', 'my', 'our', 'your', 'his', 'her',
+    'their', 'its', 'some', 'many', 'most', 'all', 'each', 'every', 'it',
+})
+DETERMINERS = r'(?:the|a|an|my|our|your|his|her|their|its|this|that|these|those)'
+# Words that make "by ..." a time, manner or measure rather than who did it
+NOT_AGENT_WORDS = frozenset({
+    'time', 'end', 'then', 'now', 'way', 'hand', 'mistake', 'accident', 'chance', 'default',
+    'far', 'means', 'yesterday', 'today', 'tomorrow', 'tonight', 'again', 'already', 'later',
+    'soon', 'noon', 'midnight', 'morning', 'evening', 'night', 'day', 'week', 'month', 'year',
+    'itself', 'myself', 'yourself', 'himself', 'herself', 'ourselves', 'themselves',
+})
+SPLIT_POINT = re.compile(r';\s+|,\s+(?=(?:and|but|so|yet)\s)', re.IGNORECASE)
+
+
+class PhraseMatcher:
+    """Finds every (possibly overlapping) occurrence of a set of phrases in one regex pass.
+
+    The phrases are folded into a trie-shaped alternation wrapped in a lookahead, so
+    the scan tests each character position once instead of once per phrase.
+    """
+
+    def __init__(self, phrases):
+        self.phrases = sorted({p.lower() for p in phrases})
+        trie = {}
+        for phrase in self.phrases:
+            node = trie
+            for ch in phrase:
+                node = node.setdefault(ch, {})
+            node[''] = {}
+        self.pattern = re.compile(f'(?=({self._trie_regex(trie)}))')
+        # The lookahead only reports the longest phrase at a position; any shorter
+        # phrase that is a prefix of it matched there too.
+        self.prefixes = {
+            p: [q for q in self.phrases if q != p and p.startswith(q)]
+            for p in self.phrases
+        }
+
+    @classmethod
+    def _trie_regex(cls, node) -> str:
+        terminal = '' in node
+        branches = [re.escape(ch) + cls._trie_regex(child)
+                    for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if terminal:
+            body = (body if len(branches) > 1 else f'(?:{body})') + '?'
+        return body
+
+    def scan(self, index: DocumentIndex) -> list[tuple[str, int, int, int]]:
+        """Scan the index's lowercased text once. Returns (phrase, sentence index, start, end) hits."""
+        matches = list(self.pattern.finditer(index.lowered))
+        positions = [match.start() for match in matches]
+        sentence_ids = index.sentence_at(positions).tolist()
+        starts = index.sentence_starts.tolist()
+
+        hits = []
+        for match, pos, idx in zip(matches, positions, sentence_ids):
+            local = pos - starts[idx]
+            phrase = match.group(1)
+            hits.append((phrase, idx, local, local + len(phrase)))
+            for shorter in self.prefixes[phrase]:
+                hits.append((shorter, idx, local, local + len(shorter)))
+        return hits
+
+
+RULES = []  # registered rule classes, in the order their issues are reported
+
+
+def register(rule: type) -> type:
+    """Class decorator adding a rule to the registry.
+
+    Register rules at import time: cached SentenceFacts and the shared phrase
+    matcher reflect the rules registered when they were built.
+    """
+    RULES.append(rule)
+    global _matcher
+    _matcher = None
+    return rule
+
+
+_matcher = None
+
+
+def rule_matcher() -> PhraseMatcher:
+    """One PhraseMatcher over the phrases of every registered rule."""
+    global _matcher
+    if _matcher is None:
+        _matcher = PhraseMatcher([phrase for rule in RULES for phrase in rule.phrases])
+    return _matcher
+
+
+def _tidy(text: str, like: str) -> str:
+    """Clean up spacing after words were removed and restore `like`'s leading capital."""
+    text = re.sub(r'\s+([,;:.!?])', r'\1', re.sub(r'\s{2,}', ' ', text)).strip()
+    text = re.sub(r'[,;:]+([.!?])', r'\1', re.sub(r'^[,;:]\s*', '', text))
+    if text and like[:1].isupper():
+        text = text[0].upper() + text[1:]
+    return text
+
+
+def _split_long(sentence: str) -> list[str]:
+    """Split at the clause boundary nearest the middle, keeping at least five words a side."""
+    best = None
+    for match in SPLIT_POINT.finditer(sentence):
+        head, tail = sentence[:match.start()], sentence[match.end():]
+        if len(head.split()) < 5 or len(tail.split()) < 5:
+            continue
+        distance = abs(len(head) - len(tail))
+        if best is None or distance < best[0]:
+            best = (distance, head, tail)
+    if best is None:
+        return [sentence]
+    _, head, tail = best
+    tail = re.sub(r'^and\s+', '', tail, flags=re.IGNORECASE)
+    head = head.rstrip(',;:') + '.'
+    return [head, tail[0].upper() + tail[1:]]
+
+
+class Rule:
+    """Base class for rules; subclasses override the declarations, feed/issues/merge
+    and the issue_count and ceiling summaries of their state."""
+
+    type = None
+    category = None  # also the score the rule's penalty counts against
+    cap = MAX_ISSUES  # issues kept for the report; None for no limit
+    pattern = None  # precompiled; scan_sentences records the sentences it matches in facts.flags
+    phrases = ()  # found in every sentence by the shared PhraseMatcher pass, into facts.phrases
+    expensive = False  # may be skipped when a document would not fit the time budget
+    cost = 0.0  # estimated seconds per MB of text on top of the shared scan
+    advice = None  # why the issue matters, for feedback written without a model
+    severity = 1.0  # weight of one issue when ranking; scaled up by its coverage
+
+    def feed(self, sentences: list[str], facts: list):
+        raise NotImplementedError
+
+    def issues(self) -> list[dict]:
+        raise NotImplementedError
+
+    def merge(self, other: 'Rule'):
+        """Take in `other`, fed the sentences right after the ones fed here, as if fed here too."""
+        raise NotImplementedError
+
+    def issue_count(self) -> int:
+        """Issues `issues` would return, before the cap."""
+        raise NotImplementedError
+
+    def ceiling(self) -> float:
+        """Highest priority among the issues `issues` would return; 0 if there are none."""
+        raise NotImplementedError
+
+    def penalty(self) -> int:
+        """How many problems count against the rule's score: the issues it reports."""
+        count = self.issue_count()
+        return count if self.cap is None else min(count, self.cap)
+
+    def priority(self, coverage: float = 1) -> float:
+        """Severity, plus a step for every doubling of `coverage` (occurrences, length over the limit)."""
+        return round(self.severity * (1 + math.log2(max(coverage, 1))), 3)
+
+    def issue(self, title: str, sentence: str, priority: float, fallback: str = None) -> dict:
+        issue = {
+            'type': self.type,
+            'category': self.category,
+            'issue': title,
+            'original': sentence,
+            'priority': priority,
+        }
+        if fallback is not None:
+            issue['fallback'] = fallback
+        return issue
+
+    @classmethod
+    def rewrite(cls, sentence: str) -> str:
+        """Deterministic rewrite of a sentence with this issue; the sentence itself if there is none."""
+        return sentence
+
+
+@register
+class PassiveVoice(Rule):
+    type = 'passive_voice'
+    category = 'Clarity'
+    cap = 2
+    pattern = re.compile(r'\b(is|are|was|were|been|being)\s+\w+ed\b', re.IGNORECASE)
+    expensive = True
+    cost = 0.08
+    advice = 'Active voice says who does what, so the sentence is shorter and easier to follow.'
+    severity = 2.5
+    # "<lead, >the cake was baked by me<.>": past tense, and the agent a short noun
+    # phrase (a pronoun, a name, or a determiner and one or two words) that ends the clause
+    active = re.compile(
+        r'^(?P<lead>(?:.*[,;:]\s+)?)(?P<subject>[^,;:]+?)\s+(?:was|were)\s+(?P<verb>\w+ed)'
+        rf'\s+by\s+(?P<agent>(?:{DETERMINERS}\s+)?[\w\'-]+(?:\s+[\w\'-]+)?)(?P<rest>[,;:.!?].*|)$',
+        re.IGNORECASE | re.DOTALL,
+    )
+
+    def __init__(self):
+        self.sentences = []
+        self.count = 0  # passive sentences in the document; the coverage of each issue
+
+    def feed(self, sentences, facts):
+        for sentence, sentence_facts in zip(sentences, facts):
+            if self.type in sentence_facts.flags:
+                self.count += 1
+                if len(self.sentences) < self.cap:
+                    self.sentences.append(sentence)
+
+    def issues(self):
+        priority = self.priority(self.count)
+        return [self.issue('Passive voice detected', sentence, priority) for sentence in self.sentences]
+
+    def issue_count(self):
+        return len(self.sentences)
+
+    def ceiling(self):
+        return self.priority(self.count) if self.sentences else 0.0
+
+    def merge(self, other):
+        self.sentences = (self.sentences + other.sentences)[:self.cap]
+        self.count += other.count
+
+    @classmethod
+    def rewrite(cls, sentence):
+        match = cls.active.match(sentence.strip())
+        if not match:
+            return sentence
+        lead, subject, verb, agent, rest = match.group('lead', 'subject', 'verb', 'agent', 'rest')
+        words = agent.split()
+        if any(word.lower() in NOT_AGENT_WORDS or word.endswith('ly') for word in words):
+            return sentence
+        if len(words) > 1 and words[0].lower() in SUBJECT_PRONOUNS and words[0].lower() != 'her':
+            # "by them all": an object pronoun is a whole agent ("her" can also be a determiner)
+            return sentence
+        agent = SUBJECT_PRONOUNS.get(agent.lower(), agent)
+        first, _, others = subject.partition(' ')
+        if first.lower() in OBJECT_PRONOUNS:
+            subject = OBJECT_PRONOUNS[first.lower()] + (' ' + others if others else '')
+        elif first.lower() in LOWERCASE_LEADS:
+            subject = subject[0].lower() + subject[1:]
+        clause = f'{agent} {verb.lower()} {subject}{rest}'
+        if lead:
+            return lead + clause
+        return clause[0].upper() + clause[1:]
+
+
+@register
+class LongSentence(Rule):
+    type = 'long_sentence'
+    category = 'Clarity'
+    advice = 'Readers lose the thread of long sentences; one idea per sentence reads faster.'
+    severity = 3.0
+
+    def __init__(self):
+        self.long = []  # (sentence, word count): the longest ones, as many as can be shown
+        self.count = 0
+
+    def feed(self, sentences, facts):
+        found = [
+            (sentence, sentence_facts.word_count)
+            for sentence, sentence_facts in zip(sentences, facts)
+            if sentence_facts.word_count > LONG_SENTENCE_WORDS
+        ]
+        if found:
+            self.count += len(found)
+            self.keep(found)
+
+    def keep(self, found: list):
+        # nlargest is stable: of equally long sentences, the earliest are kept
+        self.long = heapq.nlargest(self.cap, self.long + found, key=lambda hit: hit[1])
+
+    def issues(self):
+        return [
+            self.issue(f'Long sentence ({word_count} words)', sentence, self.priority(word_count / LONG_SENTENCE_WORDS))
+            for sentence, word_count in self.long
+        ]
+
+    def issue_count(self):
+        return len(self.long)
+
+    def ceiling(self):
+        return self.priority(self.long[0][1] / LONG_SENTENCE_WORDS) if self.long else 0.0
+
+    def merge(self, other):
+        self.keep(other.long)
+        self.count += other.count
+
+    def penalty(self):
+        return self.count  # every long sentence counts, not just the ones kept
+
+    @classmethod
+    def rewrite(cls, sentence):
+        parts = [sentence.strip()]
+        # Break the longest part again while it is still long, up to three sentences
+        while len(parts) < 3:
+            longest = max(range(len(parts)), key=lambda i: len(parts[i].split()))
+            if len(parts[longest].split()) <= LONG_SENTENCE_WORDS:
+                break
+            pieces = _split_long(parts[longest])
+            if len(pieces) == 1:
+                break
+            parts[longest:longest + 1] = pieces
+        return ' '.join(parts) if len(parts) > 1 else sentence
+
+
+class PhraseRule(Rule):
+    """Base for rules on dictionary phrases: remembers the first sentence of each phrase
+    and how many sentences contain it."""
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.phrase_set = frozenset(p.lower() for p in cls.phrases)
+
+    def __init__(self):
+        self.first_hit = {}  # lowercased phrase -> first sentence containing it
+        self.hits = Counter()  # lowercased phrase -> sentences containing it
+
+    def feed(self, sentences, facts):
+        found = [self.phrase_set.intersection(f.phrases) if f.phrases else () for f in facts]
+        self.hits.update(chain.from_iterable(found))
+        if len(self.first_hit) < len(self.phrase_set):
+            for sentence, phrases in zip(sentences, found):
+                for phrase in phrases:
+                    self.first_hit.setdefault(phrase, sentence)
+
+    def merge(self, other):
+        for phrase, sentence in other.first_hit.items():
+            self.first_hit.setdefault(phrase, sentence)
+        self.hits.update(other.hits)
+
+    def issue_count(self):
+        return len(self.first_hit)
+
+    def ceiling(self):
+        return self.priority(max(self.hits.values())) if self.hits else 0.0
+
+
+@register
+class WordyPhrase(PhraseRule):
+    type = 'wordy'
+    category = 'Conciseness'
+    advice = 'A shorter phrase says the same thing with less for the reader to get through.'
+    severity = 2.0
+    cap = None
+    phrases = tuple(WORDY_PHRASES)
+    fallbacks = {
+        phrase: (re.compile(re.escape(phrase), re.IGNORECASE), replacement)
+        for phrase, replacement in WORDY_PHRASES.items()
+    }
+
+    def issues(self):
+        issues = []
+        for phrase, replacement in WORDY_PHRASES.items():
+            sentence = self.first_hit.get(phrase.lower())
+            if sentence is not None:
+                issues.append(self.issue(f'Wordy: "{phrase}" → "{replacement}"', sentence,
+                                         self.priority(self.hits[phrase.lower()]), self.fallback(phrase, sentence)))
+        return issues
+
+    def fallback(self, phrase: str, sentence: str) -> str:
+        pattern, replacement = self.fallbacks[phrase]
+        return pattern.sub(replacement, sentence)
+
+    @classmethod
+    def rewrite(cls, sentence):
+        rewritten = sentence
+        for pattern, replacement in cls.fallbacks.values():
+            rewritten = pattern.sub(replacement, rewritten)
+        return sentence if rewritten == sentence else _tidy(rewritten, sentence)
+
+
+@register
+class ComplexWord(Rule):
+    type = 'complex_words'
+    category = 'Style'
+    advice = 'Everyday words are read faster and sound less formal.'
+    severity = 1.5
+    cap = None
+    phrases = tuple(COMPLEX_WORDS)
+    phrase_set = frozenset(COMPLEX_WORDS)
+    fallbacks = {
+        word: (re.compile(r'\b' + word + r'\b', re.IGNORECASE), simple)
+        for word, simple in COMPLEX_WORDS.items()
+    }
+
+    def __init__(self):
+        # (word, sentence, the sentence's complex words): at most one new word per
+        # sentence, in table order
+        self.complex = []
+        self.found = set()
+        self.hits = Counter()  # word -> sentences containing it
+
+    def feed(self, sentences, facts):
+        self.hits.update(chain.from_iterable(self.phrase_set.intersection(f.phrases) for f in facts if f.phrases))
+        if len(self.found) == len(COMPLEX_WORDS):
+            return  # every word is reported already
+        for sentence, sentence_facts in zip(sentences, facts):
+            if sentence_facts.phrases and not self.phrase_set.isdisjoint(sentence_facts.phrases):
+                self.take(sentence, tuple(word for word in COMPLEX_WORDS if word in sentence_facts.phrases))
+
+    def take(self, sentence: str, words: tuple):
+        for word in words:
+            if word not in self.found:
+                self.complex.append((word, sentence, words))
+                self.found.add(word)
+                return
+
+    def merge(self, other):
+        # Which word a sentence reports depends on the words found before it. The
+        # words found only grow as sentences are added in front, so a sentence that
+        # reported nothing in `other` reports nothing here; replay the rest.
+        for _, sentence, words in other.complex:
+            self.take(sentence, words)
+        self.hits.update(other.hits)
+
+    def issues(self):
+        return [
+            self.issue(f'Complex: "{word}" → "{COMPLEX_WORDS[word]}"', sentence, self.priority(self.hits[word]),
+                       self.fallback(word, sentence))
+            for word, sentence, _ in self.complex
+        ]
+
+    def issue_count(self):
+        return len(self.complex)
+
+    def ceiling(self):
+        return max((self.priority(self.hits[word]) for word, _, _ in self.complex), default=0.0)
+
+    def fallback(self, word: str, sentence: str) -> str:
+        pattern, simple = self.fallbacks[word]
+        return pattern.sub(simple, sentence)
+
+    @classmethod
+    def rewrite(cls, sentence):
+        rewritten = sentence
+        for pattern, simple in cls.fallbacks.values():
+            rewritten = pattern.sub(simple, rewritten)
+        return sentence if rewritten == sentence else _tidy(rewritten, sentence)
+
+
+@register
+class WeakWords(Rule):
+    type = 'weak_words'
+    category = 'Style'
+    cap = 1
+    phrases = tuple(WEAK_WORDS)
+    threshold = 2  # reported once the document has more filler words than this
+    advice = 'Filler words add length without meaning; the sentence is stronger without them.'
+    severity = 1.0
+    filler = re.compile(r'\b(?:' + '|'.join(WEAK_WORDS) + r')\b,?\s*', re.IGNORECASE)
+
+    def __init__(self):
+        self.count = 0
+        self.first = None
+
+    def feed(self, sentences, facts):
+        for sentence, sentence_facts in zip(sentences, facts):
+            self.count += sentence_facts.weak_count
+            if self.first is None and not WEAK_SET.isdisjoint(sentence_facts.phrases):
+                self.first = sentence
+
+    def issues(self):
+        if self.issue_count():
+            return [self.issue('Contains filler words', self.first, self.ceiling())]
+        return []
+
+    def issue_count(self):
+        return int(self.count > self.threshold and self.first is not None)
+
+    def ceiling(self):
+        # Coverage: the filler words beyond the threshold
+        return self.priority(self.count - self.threshold) if self.issue_count() else 0.0
+
+    def merge(self, other):
+        self.count += other.count
+        if self.first is None:
+            self.first = other.first
+
+    @classmethod
+    def rewrite(cls, sentence):
+        rewritten = cls.filler.sub('', sentence)
+        return sentence if rewritten == sentence else _tidy(rewritten, sentence)
+
+
+@register
+class Hedging(PhraseRule):
+    type = 'hedging'
+    category = 'Tone'
+    cap = 1
+    phrases = tuple(HEDGING_WORDS)
+    advice = 'Hedges make a point sound unsure; state it directly if you mean it.'
+    severity = 1.5
+    hedges = [re.compile(r'\b' + re.escape(hedge) + r'\b,?\s*', re.IGNORECASE) for hedge in HEDGE_REWRITES]
+
+    def issues(self):
+        # The most frequent hedge; the first in the table on a tie
+        found = [hedge for hedge in HEDGING_WORDS if hedge.lower() in self.first_hit]
+        if not found:
+            return []
+        hedge = max(found, key=lambda hedge: self.hits[hedge.lower()])
+        return [self.issue(f'Hedging: "{hedge}"', self.first_hit[hedge.lower()], self.priority(self.hits[hedge.lower()]))]
+
+    @classmethod
+    def rewrite(cls, sentence):
+        rewritten = sentence
+        for pattern in cls.hedges:
+            rewritten = pattern.sub('', rewritten)
+        return sentence if rewritten == sentence else _tidy(rewritten, sentence)
+
+
+def rewrite_sentence(issue_type: str, sentence: str) -> str:
+    """Rule-driven rewrite for an issue type, or None if the rules cannot improve the sentence.
+
+    An unknown type (e.g. "general") applies every phrase rule in turn. A rewrite
+    that leaves no words ("Maybe." without its hedge) is no rewrite.
+    """
+    rules = [rule for rule in RULES if rule.type == issue_type] or [rule for rule in RULES if rule.phrases]
+    rewritten = sentence
+    for rule in rules:
+        rewritten = rule.rewrite(rewritten)
+    if rewritten == sentence or not re.search(r'\w', rewritten):
+        return None
+    return rewritten
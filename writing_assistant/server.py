@@ -0,0 +1,117 @@
+"""
+Local stand-in for a model server: the local provider's rewrites over HTTP.
+
+    python -m writing_assistant.server --port 8765 --latency 0.2
+
+Serves the JSON protocol `providers.HTTPProvider` speaks, so the remote path
+can be tested end to end without Gemini, network access or quota:
+
+    POST /v1/rewrite  {"type", "original"}  -> {"suggestion", "error"}
+    POST /v1/batch    {"issues": [...]}     -> {"rewrites": [...]}
+    POST /v1/coach    {"text"}              -> {"analysis", "error"}
+    GET  /healthz                           -> {"ok": true}
+
+A model served behind the same endpoints is a drop-in replacement.
+"""
+
+import argparse
+import json
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .providers import NO_LOCAL_REWRITE, local_batch, local_coach
+from .rules import rewrite_sentence
+
+
+def _is_issue(item) -> bool:
+    return isinstance(item, dict) and all(isinstance(item.get(field), str) for field in ("type", "original"))
+
+
+def payload_error(path: str, payload) -> str:
+    """Why `payload` is not a valid request for `path`, or None if it is."""
+    if not isinstance(payload, dict):
+        return "body must be a JSON object"
+    if path == "/v1/rewrite" and not isinstance(payload.get("original"), str):
+        return "\"original\" must be a string"
+    if path == "/v1/rewrite" and not isinstance(payload.get("type", "general"), str):
+        return "\"type\" must be a string"
+    if path == "/v1/batch":
+        issues = payload.get("issues", [])
+        if not isinstance(issues, list) or not all(map(_is_issue, issues)):
+            return "\"issues\" must be a list of objects with string \"type\" and \"original\""
+    if path == "/v1/coach" and not isinstance(payload.get("text"), str):
+        return "\"text\" must be a string"
+    return None
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    latency = 0.0  # seconds added to every answer, to stand in for a real model
+
+    def do_GET(self):
+        if self.path == "/healthz":
+            self._reply(200, {"ok": True})
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._reply(400, {"error": "invalid JSON"})
+            return
+        if self.path not in ("/v1/rewrite", "/v1/batch", "/v1/coach"):
+            self._reply(404, {"error": "not found"})
+            return
+        error = payload_error(self.path, payload)
+        if error:
+            self._reply(400, {"error": error})
+            return
+        time.sleep(self.latency)
+        if self.path == "/v1/rewrite":
+            suggestion = rewrite_sentence(payload.get("type", "general"), payload["original"])
+            self._reply(200, {"suggestion": suggestion, "error": None if suggestion else NO_LOCAL_REWRITE})
+        elif self.path == "/v1/batch":
+            self._reply(200, {"rewrites": local_batch(payload.get("issues", []))})
+        else:
+            self._reply(200, {"analysis": "".join(local_coach(payload["text"])).strip(), "error": None})
+
+    def _reply(self, status: int, body: dict):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host: str = "127.0.0.1", port: int = 8765, latency: float = 0.0) -> ThreadingHTTPServer:
+    """Bound, not yet serving; port 0 picks a free port (see `server_address`)."""
+    handler = type("Handler", (StandInHandler,), {"latency": latency})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m writing_assistant.server", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every answer")
+    args = parser.parse_args(argv)
+
+    server = make_server(args.host, args.port, args.latency)
+    print(f"Serving on http://{args.host}:{server.server_address[1]}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""
+Lightweight in-process tracing: stage timings and counters, exportable as JSON
+or Prometheus text. Thread-safe, so AI worker threads can record into it.
+"""
+
+import functools
+import inspect
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+METRIC_PREFIX = "writing_assistant"
+
+
+class Tracer:
+    """Aggregates durations per stage and named counters for the whole process."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages = {}  # name -> {'count', 'total', 'max', 'last'} in seconds
+        self.counters = {}  # (name, ((label, value), ...)) -> number
+
+    def record(self, stage: str, seconds: float):
+        with self.lock:
+            stats = self.stages.setdefault(stage, {'count': 0, 'total': 0.0, 'max': 0.0, 'last': 0.0})
+            stats['count'] += 1
+            stats['total'] += seconds
+            stats['max'] = max(stats['max'], seconds)
+            stats['last'] = seconds
+
+    @contextmanager
+    def span(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def traced(self, stage: str = None):
+        """Decorator recording every call of a function as `stage` (default: its name).
+
+        Coroutine functions are timed until they return, not until they are called.
+        """
+        def decorate(fn):
+            name = stage or fn.__name__
+
+            if inspect.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def async_wrapper(*args, **kwargs):
+                    with self.span(name):
+                        return await fn(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def incr(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def reset(self):
+        with self.lock:
+            self.stages.clear()
+            self.counters.clear()
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            stages = {name: dict(stats) for name, stats in self.stages.items()}
+            counters = [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(self.counters.items())
+            ]
+        return {'stages': stages, 'counters': counters}
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition: a summary per stage plus one counter per name."""
+        snap = self.snapshot()
+        lines = [
+            f"# HELP {METRIC_PREFIX}_stage_seconds Time spent per analysis stage.",
+            f"# TYPE {METRIC_PREFIX}_stage_seconds summary",
+        ]
+        for stage, stats in sorted(snap['stages'].items()):
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_sum{{stage="{stage}"}} {stats["total"]:.6f}')
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_count{{stage="{stage}"}} {stats["count"]}')
+        declared = set()
+        for counter in snap['counters']:
+            metric = f"{METRIC_PREFIX}_{counter['name']}"
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} counter")
+                declared.add(metric)
+            labels = ",".join(f'{k}="{v}"' for k, v in counter['labels'].items())
+            lines.append(f"{metric}{{{labels}}} {counter['value']}" if labels else f"{metric} {counter['value']}")
+        return "\n".join(lines) + "\n"
+
+
+TRACER = Tracer()
+span = TRACER.span
+traced = TRACER.traced
+incr = TRACER.incr
@@ -5,9 +5,54 @@ Free to use with Google Gemini AI.
 """
 
 import streamlit as st
-import re
+import hashlib
+import html
 import os
-from google import genai
+import queue
+import time
+
+# Taken before the package imports, so a cold start's imports count toward first paint
+run_started = time.perf_counter()
+
+from writing_assistant.analysis import analyze_stream, analyze_text
+from writing_assistant.ai import get_api_key as env_api_key, get_client, get_key_stats
+from writing_assistant.aio import get_backend
+from writing_assistant.memo import RESULT_CACHE
+from writing_assistant.providers import get_provider
+from writing_assistant.rules import rewrite_sentence
+from writing_assistant.tracing import TRACER
+
+RERUN_POLL = 0.25  # seconds between checks for a rerun while waiting on AI results
+# Optional Prometheus textfile, rewritten after every analysis (e.g. for node_exporter)
+METRICS_FILE = os.environ.get("WRITING_ASSISTANT_METRICS_FILE")
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+STYLESHEET = "style.css"
+FIRST_PAINT_TARGET = 0.3  # seconds from script start to the header, cold worker included
+# Issues come ranked by priority; only this many from the top get AI rewrites,
+# the rest the rules' own rewrite
+AI_REWRITE_ISSUES = int(os.environ.get("WRITING_ASSISTANT_AI_ISSUES", 4))
+
+
+@st.cache_resource
+def load_stylesheet() -> tuple[str, str]:
+    """Stylesheet text and a short content hash, read once per server process."""
+    with open(os.path.join(STATIC_DIR, STYLESHEET), encoding="utf-8") as f:
+        css = f.read()
+    return css, hashlib.blake2b(css.encode("utf-8"), digest_size=6).hexdigest()
+
+
+def inject_styles():
+    """Link the static stylesheet, or inline it when static serving is off.
+
+    Streamlit re-sends every element on each rerun, so with static serving the
+    per-rerun payload is a single tag; the hash busts the browser cache on edits.
+    """
+    css, version = load_stylesheet()
+    if st.get_option("server.enableStaticServing"):
+        st.markdown(f'<link rel="stylesheet" href="app/static/{STYLESHEET}?v={version}">', unsafe_allow_html=True)
+    else:
+        st.markdown(f"<style>\n{css}\n</style>", unsafe_allow_html=True)
+
 
 # Page configuration
 st.set_page_config(
@@ -17,377 +62,18 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
-# Custom CSS — Editorial / Literary Magazine Aesthetic
-st.markdown("""
-<link href="https://fonts.googleapis.com/css2?family=Playfair+Display:ital,wght@0,400;0,600;0,700;1,400&family=Source+Serif+4:ital,opsz,wght@0,8..60,300;0,8..60,400;0,8..60,600;1,8..60,400&family=JetBrains+Mono:wght@400;500&display=swap" rel="stylesheet">
-<style>
-    :root {
-        --ink: #1a1a1a;
-        --ink-light: #3d3529;
-        --parchment: #faf8f4;
-        --parchment-deep: #f3efe8;
-        --warm-gray: #8a8070;
-        --accent-rust: #b85c38;
-        --accent-rust-light: #d4845a;
-        --accent-forest: #4a6741;
-        --accent-forest-light: #e8f0e5;
-        --accent-gold: #c4973b;
-        --accent-gold-light: #fdf6e8;
-        --rule: #d5cfc5;
-        --serif: 'Playfair Display', 'Georgia', serif;
-        --body: 'Source Serif 4', 'Georgia', serif;
-        --mono: 'JetBrains Mono', monospace;
-    }
-
-    /* === Global overrides === */
-    .main {
-        background: var(--parchment) !important;
-    }
-    .main .block-container {
-        padding: 2.5rem 3rem 4rem 3rem;
-        max-width: 820px;
-    }
-    .stApp {
-        background: var(--parchment) !important;
-    }
-    .stApp > header {
-        background: transparent !important;
-    }
-
-    /* Subtle paper grain overlay */
-    .main::before {
-        content: '';
-        position: fixed;
-        inset: 0;
-        background-image: url("data:image/svg+xml,%3Csvg viewBox='0 0 256 256' xmlns='http://www.w3.org/2000/svg'%3E%3Cfilter id='noise'%3E%3CfeTurbulence type='fractalNoise' baseFrequency='0.9' numOctaves='4' stitchTiles='stitch'/%3E%3C/filter%3E%3Crect width='100%25' height='100%25' filter='url(%23noise)' opacity='0.025'/%3E%3C/svg%3E");
-        pointer-events: none;
-        z-index: 0;
-    }
-
-    /* === Typography === */
-    h1, h2, h3 {
-        font-family: var(--serif) !important;
-        color: var(--ink) !important;
-    }
-    p, li, label, .stMarkdown {
-        font-family: var(--body) !important;
-        color: var(--ink-light) !important;
-    }
-
-    /* === Metrics — editorial stat cards === */
-    [data-testid="stMetricValue"] {
-        font-family: var(--serif) !important;
-        font-size: 2rem !important;
-        font-weight: 700 !important;
-        color: var(--ink) !important;
-        letter-spacing: -0.02em;
-    }
-    [data-testid="stMetricLabel"] {
-        font-family: var(--mono) !important;
-        font-size: 0.7rem !important;
-        text-transform: uppercase;
-        letter-spacing: 0.12em;
-        color: var(--warm-gray) !important;
-    }
-    [data-testid="stMetricValue"], [data-testid="stMetricLabel"] {
-        text-align: center;
-    }
-
-    /* === Text area — manuscript feel === */
-    .stTextArea textarea {
-        border-radius: 2px !important;
-        border: 1px solid var(--rule) !important;
-        font-family: var(--body) !important;
-        font-size: 1.05rem !important;
-        line-height: 1.85 !important;
-        background: #fff !important;
-        color: var(--ink) !important;
-        padding: 1.25rem 1.5rem !important;
-        transition: border-color 0.2s ease;
-    }
-    .stTextArea textarea:focus {
-        border-color: var(--accent-rust) !important;
-        box-shadow: 0 0 0 1px var(--accent-rust-light) !important;
-    }
-    .stTextArea textarea::placeholder {
-        color: var(--warm-gray) !important;
-        font-style: italic !important;
-    }
-
-    /* === Buttons === */
-    .stButton > button {
-        border-radius: 2px !important;
-        padding: 0.7rem 2rem !important;
-        font-family: var(--mono) !important;
-        font-size: 0.8rem !important;
-        font-weight: 500 !important;
-        text-transform: uppercase !important;
-        letter-spacing: 0.15em !important;
-        background: var(--ink) !important;
-        color: var(--parchment) !important;
-        border: none !important;
-        transition: all 0.25s ease !important;
-    }
-    .stButton > button:hover {
-        background: var(--accent-rust) !important;
-        transform: translateY(-1px);
-        box-shadow: 0 4px 12px rgba(184, 92, 56, 0.25) !important;
-    }
-    .stButton > button:active {
-        transform: translateY(0px);
-    }
-
-    /* === Section headers — editorial rules === */
-    .section-header {
-        font-family: var(--serif) !important;
-        font-size: 1.4rem !important;
-        font-weight: 600 !important;
-        color: var(--ink) !important;
-        margin: 2.5rem 0 1rem 0;
-        padding-bottom: 0.6rem;
-        border-bottom: 2px solid var(--ink);
-        letter-spacing: -0.01em;
-    }
-
-    /* === Sidebar toggle arrow — force dark on all states === */
-    [data-testid="collapsedControl"],
-    [data-testid="collapsedControl"] *,
-    [data-testid="stSidebarCollapsedControl"],
-    [data-testid="stSidebarCollapsedControl"] *,
-    [data-testid="stSidebarCollapseButton"],
-    [data-testid="stSidebarCollapseButton"] *,
-    .st-emotion-cache-1dp5vir,
-    .st-emotion-cache-1dp5vir *,
-    button[kind="header"],
-    button[kind="header"] * {
-        color: #1a1a1a !important;
-        fill: #1a1a1a !important;
-        stroke: #1a1a1a !important;
-    }
-    /* Also target the sidebar close button inside the sidebar */
-    [data-testid="stSidebar"] button[kind="header"],
-    [data-testid="stSidebar"] button[kind="header"] *,
-    [data-testid="stSidebar"] [data-testid="stSidebarCollapseButton"],
-    [data-testid="stSidebar"] [data-testid="stSidebarCollapseButton"] * {
-        color: #1a1a1a !important;
-        fill: #1a1a1a !important;
-        stroke: #1a1a1a !important;
-    }
-
-    /* === Hide Streamlit chrome === */
-    #MainMenu {visibility: hidden;}
-    footer {visibility: hidden;}
-    .stDeployButton {display: none;}
-
-    /* === Issue cards — manuscript note style === */
-    .issue-card {
-        background: #fff;
-        border-radius: 0;
-        padding: 1.1rem 1.4rem;
-        margin: 1.2rem 0 0.5rem 0;
-        border: 1px solid var(--rule);
-        border-left: 3px solid var(--accent-rust);
-        position: relative;
-    }
-    .issue-card::before {
-        content: '';
-        position: absolute;
-        top: 0;
-        left: 0;
-        right: 0;
-        height: 1px;
-        background: linear-gradient(to right, var(--accent-rust), transparent);
-    }
-
-    .category-badge {
-        background: transparent;
-        color: var(--accent-rust);
-        padding: 0.15rem 0;
-        border-radius: 0;
-        font-family: var(--mono) !important;
-        font-size: 0.65rem;
-        font-weight: 500;
-        text-transform: uppercase;
-        letter-spacing: 0.14em;
-        display: inline-block;
-        margin-bottom: 0.35rem;
-    }
-
-    .issue-title {
-        font-family: var(--body) !important;
-        font-weight: 600;
-        color: var(--ink) !important;
-        font-size: 0.95rem;
-        margin-bottom: 0.25rem;
-        line-height: 1.4;
-    }
-
-    /* === Text comparison boxes === */
-    .text-box {
-        padding: 1rem 1.2rem;
-        border-radius: 0;
-        font-family: var(--body) !important;
-        font-size: 0.92rem;
-        line-height: 1.7;
-        margin: 0.5rem 0;
-        color: var(--ink) !important;
-    }
-
-    .original-box {
-        background: var(--accent-gold-light);
-        border-left: 3px solid var(--accent-gold);
-        color: var(--ink-light) !important;
-    }
-
-    .revised-box {
-        background: var(--accent-forest-light);
-        border-left: 3px solid var(--accent-forest);
-        color: var(--ink-light) !important;
-    }
-
-    .placeholder-box {
-        background: var(--parchment-deep);
-        border-left: 3px solid var(--rule);
-        color: var(--warm-gray) !important;
-        font-style: italic;
-    }
-
-    /* === Overall message box === */
-    .message-box {
-        background: #fff;
-        padding: 1.2rem 1.5rem;
-        border-radius: 0;
-        border: 1px solid var(--rule);
-        margin: 1.2rem 0;
-        position: relative;
-    }
-    .message-box p {
-        color: var(--ink) !important;
-        font-family: var(--body) !important;
-    }
-
-    /* === AI feedback box === */
-    .ai-feedback {
-        background: #fff;
-        border-radius: 0;
-        padding: 1.5rem 1.75rem;
-        border: 1px solid var(--rule);
-        line-height: 1.8;
-        color: var(--ink-light) !important;
-        font-family: var(--body) !important;
-        font-size: 0.95rem;
-        position: relative;
-    }
-    .ai-feedback::before {
-        content: '';
-        position: absolute;
-        top: -1px;
-        left: 0;
-        right: 0;
-        height: 2px;
-        background: linear-gradient(to right, var(--accent-rust), var(--accent-gold), transparent);
-    }
-
-    /* === Sidebar === */
-    [data-testid="stSidebar"] {
-        background: var(--parchment-deep) !important;
-        border-right: 1px solid var(--rule) !important;
-    }
-    [data-testid="stSidebar"] .stMarkdown p,
-    [data-testid="stSidebar"] .stMarkdown li,
-    [data-testid="stSidebar"] h1,
-    [data-testid="stSidebar"] h2,
-    [data-testid="stSidebar"] h3 {
-        color: var(--ink-light) !important;
-    }
-
-    /* === Toggle === */
-    .stToggle label span {
-        font-family: var(--body) !important;
-        color: var(--ink-light) !important;
-    }
-
-    /* === Radio buttons === */
-    .stRadio label {
-        font-family: var(--body) !important;
-        color: var(--ink-light) !important;
-    }
-
-    /* === Dividers === */
-    hr {
-        border: none !important;
-        border-top: 1px solid var(--rule) !important;
-        margin: 1.5rem 0 !important;
-    }
-
-    /* === Scrollbar styling === */
-    ::-webkit-scrollbar {
-        width: 6px;
-    }
-    ::-webkit-scrollbar-track {
-        background: var(--parchment-deep);
-    }
-    ::-webkit-scrollbar-thumb {
-        background: var(--rule);
-        border-radius: 3px;
-    }
-    ::-webkit-scrollbar-thumb:hover {
-        background: var(--warm-gray);
-    }
-
-    /* === Score cards container === */
-    .score-card {
-        text-align: center;
-        padding: 1rem 0.5rem;
-        border: 1px solid var(--rule);
-        background: #fff;
-        position: relative;
-    }
-    .score-card::after {
-        content: '';
-        position: absolute;
-        bottom: 0;
-        left: 50%;
-        transform: translateX(-50%);
-        width: 40%;
-        height: 2px;
-        background: var(--accent-rust);
-    }
-    .score-val {
-        font-family: var(--serif);
-        font-size: 2rem;
-        font-weight: 700;
-        color: var(--ink);
-        line-height: 1.2;
-    }
-    .score-label {
-        font-family: var(--mono);
-        font-size: 0.65rem;
-        text-transform: uppercase;
-        letter-spacing: 0.14em;
-        color: var(--warm-gray);
-        margin-top: 0.3rem;
-    }
-</style>
-""", unsafe_allow_html=True)
+# Custom CSS — Editorial / Literary Magazine Aesthetic, served from ./static
+inject_styles()
 
 
-# Initialize Gemini
-def get_client():
-    """Get configured Gemini client."""
-    api_key = os.environ.get("GOOGLE_API_KEY") or st.session_state.get("api_key", "")
-    if api_key:
-        try:
-            return genai.Client(api_key=api_key)
-        except Exception as e:
-            st.error(f"API Error: {e}")
-            return None
-    return None
+def get_api_key() -> str:
+    """API key from the environment (GOOGLE_API_KEY or the GOOGLE_API_KEYS pool) or the sidebar."""
+    return env_api_key() or st.session_state.get("api_key", "")
 
 
 def test_api_connection():
     """Test if API key works."""
-    client = get_client()
+    client = get_client(get_api_key())
     if client:
         try:
             # List models to verify API key works
@@ -399,100 +85,6 @@ def test_api_connection():
     return False
 
 
-def get_available_model(client):
-    """Find an available model for text generation."""
-    try:
-        for model in client.models.list():
-            model_name = model.name if hasattr(model, 'name') else str(model)
-            # Look for gemini models that support generation
-            if 'gemini' in model_name.lower() and 'flash' in model_name.lower():
-                return model_name.replace('models/', '')
-        # Fallback to any gemini model
-        for model in client.models.list():
-            model_name = model.name if hasattr(model, 'name') else str(model)
-            if 'gemini' in model_name.lower():
-                return model_name.replace('models/', '')
-    except:
-        pass
-    return "gemini-1.5-flash-latest"  # Default fallback
-
-
-def get_ai_suggestion(issue_type: str, original: str) -> tuple[str, str]:
-    """Get AI-powered suggestion for a specific issue. Returns (suggestion, error)."""
-    client = get_client()
-    if not client:
-        return None, "No API key configured"
-
-    prompts = {
-        "passive_voice": f"Rewrite this sentence in active voice. Return ONLY the rewritten sentence:\n\n{original}",
-        "long_sentence": f"Break this into 2-3 shorter, clearer sentences. Return ONLY the rewritten text:\n\n{original}",
-        "wordy": f"Make this more concise. Return ONLY the rewritten sentence:\n\n{original}",
-        "complex_words": f"Simplify using everyday words. Return ONLY the rewritten sentence:\n\n{original}",
-        "weak_words": f"Remove filler words and strengthen this. Return ONLY the rewritten sentence:\n\n{original}",
-        "hedging": f"Make this more confident and direct. Return ONLY the rewritten sentence:\n\n{original}",
-        "general": f"Improve clarity and impact. Return ONLY the rewritten sentence:\n\n{original}",
-    }
-
-    prompt = prompts.get(issue_type, prompts["general"])
-
-    try:
-        model_name = get_available_model(client)
-        response = client.models.generate_content(
-            model=model_name,
-            contents=prompt
-        )
-        return response.text.strip(), None
-    except Exception as e:
-        error_msg = str(e)
-        if "429" in error_msg or "RESOURCE_EXHAUSTED" in error_msg:
-            return None, "Rate limit - wait 15 seconds"
-        return None, f"AI error: {error_msg[:100]}"
-
-
-def get_full_analysis(text: str) -> tuple[str, str]:
-    """Get comprehensive AI analysis. Returns (analysis, error)."""
-    client = get_client()
-    if not client:
-        return None, "No API key configured"
-
-    prompt = f"""You are a helpful writing coach. Analyze this text and provide friendly, actionable feedback.
-
-For each issue you find:
-1. Quote the problematic text
-2. Explain briefly why it could be improved
-3. Provide a specific rewritten version
-
-Focus on: clarity, conciseness, tone, and impact. Be encouraging!
-
-TEXT:
-{text}
-
-Provide your feedback in a clear, organized format."""
-
-    try:
-        model_name = get_available_model(client)
-        response = client.models.generate_content(
-            model=model_name,
-            contents=prompt
-        )
-        return response.text.strip(), None
-    except Exception as e:
-        error_msg = str(e)
-        if "429" in error_msg or "RESOURCE_EXHAUSTED" in error_msg:
-            return None, "Rate limit exceeded. Please wait 15-30 seconds and try again."
-        return None, f"Error: {error_msg}"
-
-
-# Helper functions
-def get_sentences(text: str) -> list[str]:
-    sentences = re.split(r'(?<=[.!?])\s+', text.strip())
-    return [s.strip() for s in sentences if s.strip()]
-
-
-def get_words(text: str) -> list[str]:
-    return re.findall(r'\b[a-zA-Z]+\b', text.lower())
-
-
 def get_overall_message(score: int) -> tuple[str, str]:
     if score >= 8:
         return "🌟", "Excellent work! Your writing is clear and polished."
@@ -504,152 +96,79 @@ def get_overall_message(score: int) -> tuple[str, str]:
         return "🌱", "Let's improve this together! See the suggestions below."
 
 
-# Analysis patterns
-WORDY_PHRASES = {
-    'in order to': 'to', 'due to the fact that': 'because',
-    'at this point in time': 'now', 'in the event that': 'if',
-    'for the purpose of': 'to', 'at the present time': 'now',
-    'in the near future': 'soon', 'has the ability to': 'can',
-    'is able to': 'can', 'a large number of': 'many',
-    'the majority of': 'most', 'in close proximity to': 'near',
-    'take into consideration': 'consider', 'make a decision': 'decide',
-}
-
-COMPLEX_WORDS = {
-    'utilize': 'use', 'implement': 'start', 'facilitate': 'help',
-    'leverage': 'use', 'optimize': 'improve', 'methodology': 'method',
-    'functionality': 'feature', 'subsequently': 'then',
-    'approximately': 'about', 'commence': 'begin', 'terminate': 'end',
-    'endeavor': 'try', 'sufficient': 'enough', 'numerous': 'many',
-}
-
-WEAK_WORDS = ['very', 'really', 'quite', 'rather', 'somewhat',
-              'basically', 'actually', 'literally', 'just']
-
-HEDGING_WORDS = ['maybe', 'perhaps', 'possibly', 'might', 'could be',
-                 'seems like', 'sort of', 'kind of', 'I think', 'I believe']
-
-
-def analyze_text(text: str) -> dict:
-    """Analyze text for issues."""
-    sentences = get_sentences(text)
-    words = get_words(text)
-    issues = []
-
-    # Passive voice
-    for sentence in sentences:
-        if re.search(r'\b(is|are|was|were|been|being)\s+\w+ed\b', sentence, re.IGNORECASE):
-            issues.append({
-                'type': 'passive_voice',
-                'category': 'Clarity',
-                'issue': 'Passive voice detected',
-                'original': sentence,
-            })
-            if len(issues) >= 2:
-                break
-
-    # Long sentences
-    for sentence in sentences:
-        word_count = len(get_words(sentence))
-        if word_count > 30:
-            issues.append({
-                'type': 'long_sentence',
-                'category': 'Clarity',
-                'issue': f'Long sentence ({word_count} words)',
-                'original': sentence,
-            })
-
-    # Wordy phrases
-    for phrase, replacement in WORDY_PHRASES.items():
-        for sentence in sentences:
-            if phrase.lower() in sentence.lower():
-                issues.append({
-                    'type': 'wordy',
-                    'category': 'Conciseness',
-                    'issue': f'Wordy: "{phrase}" → "{replacement}"',
-                    'original': sentence,
-                    'fallback': re.sub(re.escape(phrase), replacement, sentence, flags=re.IGNORECASE)
-                })
-                break
-
-    # Complex words
-    found_complex = set()
-    for sentence in sentences:
-        for word, simple in COMPLEX_WORDS.items():
-            if word in sentence.lower() and word not in found_complex:
-                issues.append({
-                    'type': 'complex_words',
-                    'category': 'Style',
-                    'issue': f'Complex: "{word}" → "{simple}"',
-                    'original': sentence,
-                    'fallback': re.sub(r'\b' + word + r'\b', simple, sentence, flags=re.IGNORECASE)
-                })
-                found_complex.add(word)
-                break
-
-    # Weak words
-    weak_found = [w for w in words if w in WEAK_WORDS]
-    if len(weak_found) > 2:
-        for sentence in sentences:
-            if any(w in sentence.lower() for w in WEAK_WORDS):
-                issues.append({
-                    'type': 'weak_words',
-                    'category': 'Style',
-                    'issue': 'Contains filler words',
-                    'original': sentence,
-                })
-                break
-
-    # Hedging
-    for hedge in HEDGING_WORDS:
-        for sentence in sentences:
-            if hedge.lower() in sentence.lower():
-                issues.append({
-                    'type': 'hedging',
-                    'category': 'Tone',
-                    'issue': f'Hedging: "{hedge}"',
-                    'original': sentence,
-                })
-                break
-        if any(i['type'] == 'hedging' for i in issues):
-            break
-
-    # Calculate scores
-    clarity_issues = len([i for i in issues if i['category'] == 'Clarity'])
-    style_issues = len([i for i in issues if i['category'] == 'Style'])
-    conciseness_issues = len([i for i in issues if i['category'] == 'Conciseness'])
-    tone_issues = len([i for i in issues if i['category'] == 'Tone'])
-
-    scores = {
-        'clarity': max(5, 10 - clarity_issues * 2),
-        'style': max(5, 10 - style_issues * 2),
-        'conciseness': max(5, 10 - conciseness_issues * 2),
-        'tone': max(5, 10 - tone_issues * 2),
-    }
-    scores['overall'] = round(sum(scores.values()) / 4)
-
-    return {
-        'issues': issues[:8],
-        'scores': scores,
-        'stats': {
-            'words': len(words),
-            'sentences': len(sentences),
-            'avg_length': round(len(words) / max(len(sentences), 1), 1)
-        }
-    }
+def revised_html(issue: dict, ai_suggestion: str, ai_error: str, use_ai: bool) -> str:
+    """HTML for the Revised column of an issue card.
+
+    Without an AI rewrite (AI off, or the call throttled or failed) the rules'
+    own rewrite is shown, and the error as a caption under it.
+    """
+    suggestion = ai_suggestion or rewrite_sentence(issue['type'], issue['original']) or issue.get('fallback')
+    if suggestion:
+        fragment = f'<div class="text-box revised-box">{suggestion}</div>'
+        if ai_error and use_ai:
+            fragment += f'<p class="card-caption">⚠️ {html.escape(ai_error)} (showing fallback)</p>'
+        return fragment
+    if ai_error:
+        msg = ai_error
+    elif use_ai:
+        msg = "AI rewrites go to the highest-priority issues"
+    else:
+        msg = "Enable AI suggestions for a personalized rewrite"
+    return f'<div class="text-box placeholder-box">{msg}</div>'
+
+
+def rule_rewrite(issue: dict) -> tuple[str, str]:
+    """(suggestion, error) for an issue ranked below the AI cut."""
+    return rewrite_sentence(issue['type'], issue['original']), None
+
+
+def render_issue_card(slot, issue: dict, revised: str):
+    """Draw a whole issue card into its slot as one element."""
+    slot.markdown(f"""
+<div class="issue-card">
+    <span class="category-badge">{issue['category']}</span>
+    <div class="issue-title">{issue['issue']}</div>
+</div>
+<div class="card-columns">
+    <div>
+        <p class="col-label">Original</p>
+        <div class="text-box original-box">{issue['original']}</div>
+    </div>
+    <div>
+        <p class="col-label">Revised</p>
+        {revised}
+    </div>
+</div>
+""", unsafe_allow_html=True)
+
+
+def render_coach_feedback(feedback: str):
+    """Render the AI Writing Coach box."""
+    st.markdown(f"""
+    <div class="ai-feedback" style="white-space: pre-wrap;">
+{feedback}
+    </div>
+    """, unsafe_allow_html=True)
 
 
 # ============== MAIN APP ==============
 
-# Header
-st.markdown("""
+HEADER_HTML = """
 <div style="text-align: center; padding: 3rem 0 1.5rem 0;">
     <p style="font-family: var(--mono); font-size: 0.65rem; text-transform: uppercase; letter-spacing: 0.25em; color: var(--accent-rust); margin-bottom: 0.75rem;">AI-Powered</p>
     <h1 style="font-family: var(--serif); font-size: 3.2rem; margin-bottom: 0.4rem; color: var(--ink); font-weight: 700; letter-spacing: -0.02em; line-height: 1.1;">Writing<br>Assistant</h1>
     <div style="width: 50px; height: 2px; background: var(--ink); margin: 1rem auto;"></div>
     <p style="font-family: var(--body); font-size: 1rem; color: var(--warm-gray); font-style: italic;">Refine your prose with intelligent suggestions</p>
 </div>
-""", unsafe_allow_html=True)
+"""
+
+# Header
+st.markdown(HEADER_HTML, unsafe_allow_html=True)
+first_paint = time.perf_counter() - run_started
+TRACER.record("first_paint", first_paint)
+
+# Rewrites and coach feedback come from the configured provider
+provider = get_provider()
 
 # API Key in sidebar
 with st.sidebar:
@@ -691,8 +210,12 @@ with st.sidebar:
     *Free tier: 15 requests/min*
     """)
 
-# Check API availability
-has_api = bool(os.environ.get("GOOGLE_API_KEY") or st.session_state.get("api_key"))
+    st.markdown("---")
+    show_timings = st.toggle("Performance panel", value=False, help="Per-stage timings and request counts")
+    st.caption(f"Provider: {provider.name} (WRITING_ASSISTANT_PROVIDER)")
+
+# Check API availability; the local provider needs no key
+has_api = bool(get_api_key()) or not provider.needs_key
 
 st.markdown("---")
 
@@ -707,6 +230,7 @@ input_method = st.radio(
 )
 
 text = ""
+uploaded = None
 
 if "Paste" in input_method:
     text = st.text_area(
@@ -718,8 +242,8 @@ if "Paste" in input_method:
 else:
     uploaded = st.file_uploader("Upload", type=['txt', 'md'], label_visibility="collapsed")
     if uploaded:
-        text = uploaded.read().decode('utf-8')
-        st.info(f"Loaded {len(text.split())} words")
+        # Decoded and analyzed incrementally on Analyze, not held as one string
+        st.info(f"Loaded {uploaded.name} ({max(uploaded.size // 1024, 1)} KB)")
 
 # Options row
 st.markdown("")
@@ -739,16 +263,74 @@ with col2:
 
 # Analyze button
 st.markdown("")
-if st.button("ANALYZE MY WRITING", type="primary", use_container_width=True):
+analyze_clicked = st.button("ANALYZE MY WRITING", type="primary", use_container_width=True)
+
+# Results are memoized by input and options; reruns that leave both unchanged
+# (sidebar, API key test, ...) redraw the last analysis without redoing any work
+analysis_key = None
+if text.strip() or uploaded is not None:
+    analysis_key = RESULT_CACHE.key(text if uploaded is None else uploaded.getvalue(), use_ai=use_ai,
+                                  provider=provider.name)
+cached = None
+if analysis_key and (analyze_clicked or st.session_state.get("analysis_key") == analysis_key):
+    cached = RESULT_CACHE.get(analysis_key)
+
+if analyze_clicked or cached:
 
-    if not text.strip():
+    if analysis_key is None:
         st.warning("Please enter some text to analyze.")
     else:
         st.markdown("---")
 
         # Run analysis
-        with st.spinner("Analyzing..."):
-            results = analyze_text(text)
+        if cached:
+            results = cached['results']
+        else:
+            with st.spinner("Analyzing..."):
+                if uploaded is not None:
+                    uploaded.seek(0)
+                    results = analyze_stream(uploaded, truncate=True)
+                else:
+                    results = analyze_text(text, truncate=True)
+        st.session_state.analysis_key = analysis_key
+
+        # (suggestion, error) per issue and for the coach, once known. Failed
+        # results are kept too, so reruns show their errors; Analyze retries them
+        rewrites = list(cached['rewrites']) if cached and 'rewrites' in cached else None
+        coach = cached.get('coach') if cached else None
+        if analyze_clicked:
+            if rewrites is not None and any(error for _, error in rewrites):
+                rewrites = None
+            if coach is not None and coach[1]:
+                coach = None
+
+        # Send every AI request at once as tasks on the shared event loop; the token
+        # bucket and semaphore keep them within quota. Each task reports back through
+        # `events`, which this script thread drains below.
+        events = queue.Queue()
+        futures = []
+
+        def submit(coro, kind, i=None):
+            future = get_backend().submit(coro)
+            future.add_done_callback(lambda f: events.put((kind, i, f)))
+            futures.append(future)
+
+        # Only an Analyze click sends requests: reruns from other widgets redraw what is stored
+        pending = 0
+        if use_ai and analyze_clicked and (rewrites is None or coach is None):
+            api_key = get_api_key()
+            ranked = results['issues'][:AI_REWRITE_ISSUES]
+            if ranked and rewrites is None:
+                submit(provider.get_batch_suggestions(ranked, api_key), 'batch')
+                pending += 1
+            if has_api and coach is None:
+                coach_started = time.perf_counter()
+                full_text = text if uploaded is None else uploaded.getvalue().decode('utf-8')
+                submit(provider.get_full_analysis(full_text, lambda chunk: events.put(('coach_chunk', None, chunk)),
+                                                  api_key), 'coach')
+                pending += 1
+
+        render_started = time.perf_counter()
 
         # Scores section
         st.markdown('<p class="section-header">Assessment</p>', unsafe_allow_html=True)
@@ -765,27 +347,36 @@ if st.button("ANALYZE MY WRITING", type="primary", use_container_width=True):
                 <div class="score-label">{name}</div>
             </div>'''
         scores_html += '</div>'
-        st.markdown(scores_html, unsafe_allow_html=True)
-
-        # Stats
-        st.markdown("")
-        st.markdown(
-            f"<p style='color: var(--warm-gray); font-family: var(--mono); font-size: 0.75rem; letter-spacing: 0.05em;'>"
-            f"<strong>{results['stats']['words']}</strong> words &middot; "
-            f"<strong>{results['stats']['sentences']}</strong> sentences &middot; "
-            f"<strong>{results['stats']['avg_length']}</strong> avg words/sentence</p>",
-            unsafe_allow_html=True
-        )
 
-        # Overall message
+        # Stats and overall message, sent together with the scores as one element
+        stats = results['stats']
+        readability_html = ""
+        if stats['flesch_reading_ease'] is not None:
+            readability_html = (
+                f" &middot; reading ease <strong>{stats['flesch_reading_ease']}</strong>"
+                f" &middot; grade <strong>{stats['flesch_kincaid_grade']}</strong>"
+            )
         emoji, message = get_overall_message(results['scores']['overall'])
-        st.markdown(f"""
+        scores_html += (
+            f"<p style='color: var(--warm-gray); font-family: var(--mono); font-size: 0.75rem; letter-spacing: 0.05em; margin-top: 1.5rem;'>"
+            f"<strong>{stats['words']}</strong> words &middot; "
+            f"<strong>{stats['sentences']}</strong> sentences &middot; "
+            f"<strong>{stats['avg_length']}</strong> avg words/sentence{readability_html}</p>"
+            f"""
         <div class="message-box">
             <p style="color: var(--ink); font-size: 1.05rem; margin: 0; font-family: var(--body); font-style: italic;">
                 {emoji} {message}
             </p>
         </div>
-        """, unsafe_allow_html=True)
+        """
+        )
+        st.markdown(scores_html, unsafe_allow_html=True)
+        if results.get('skipped_rules'):
+            skipped = ", ".join(rule.replace('_', ' ') for rule in results['skipped_rules'])
+            st.caption(f"Skipped on a document this long to keep analysis fast: {skipped}")
+        if results.get('truncated'):
+            share = results['truncated']['analyzed'] / results['truncated']['total']
+            st.caption(f"Only the first {share:.0%} of this document was analyzed, to keep analysis fast")
 
         # Suggestions
         if results['issues']:
@@ -793,67 +384,118 @@ if st.button("ANALYZE MY WRITING", type="primary", use_container_width=True):
             st.markdown('<p class="section-header">Suggestions</p>', unsafe_allow_html=True)
             st.markdown(f"<p style='color: var(--warm-gray); font-style: italic;'>{len(results['issues'])} areas identified for revision</p>", unsafe_allow_html=True)
 
+            # One element per card; AI results replace the whole card in place
+            card_slots = []
             for i, issue in enumerate(results['issues']):
-                st.markdown(f"""
-                <div class="issue-card">
-                    <span class="category-badge">{issue['category']}</span>
-                    <div class="issue-title">{issue['issue']}</div>
-                </div>
-                """, unsafe_allow_html=True)
-
-                col1, col2 = st.columns(2)
-
-                with col1:
-                    st.markdown("**Original**")
-                    st.markdown(f"""
-                    <div class="text-box original-box">{issue['original']}</div>
-                    """, unsafe_allow_html=True)
-
-                with col2:
-                    st.markdown("**Revised**")
-
-                    suggestion = issue.get('fallback')
-                    ai_error = None
-
-                    if use_ai:
-                        with st.spinner("AI thinking..."):
-                            ai_suggestion, ai_error = get_ai_suggestion(issue['type'], issue['original'])
-                            if ai_suggestion:
-                                suggestion = ai_suggestion
-
-                    if suggestion:
-                        st.markdown(f"""
-                        <div class="text-box revised-box">{suggestion}</div>
-                        """, unsafe_allow_html=True)
-                        if ai_error and use_ai:
-                            st.caption(f"⚠️ {ai_error} (showing fallback)")
-                    else:
-                        msg = ai_error if ai_error else "Enable AI suggestions for a personalized rewrite"
-                        st.markdown(f"""
-                        <div class="text-box placeholder-box">{msg}</div>
-                        """, unsafe_allow_html=True)
-
-                st.markdown("")
+                slot = st.empty()
+                if rewrites is not None:
+                    render_issue_card(slot, issue, revised_html(issue, *rewrites[i], use_ai))
+                elif use_ai and pending and i < AI_REWRITE_ISSUES:
+                    render_issue_card(slot, issue, '<div class="text-box placeholder-box">AI thinking...</div>')
+                elif use_ai:
+                    render_issue_card(slot, issue, revised_html(issue, *rule_rewrite(issue), use_ai))
+                else:
+                    render_issue_card(slot, issue, revised_html(issue, None, None, use_ai))
+                card_slots.append(slot)
 
         else:
             st.success("Excellent — no major issues found.")
 
         # Full AI Analysis
+        coach_slot = None
         if use_ai and has_api:
             st.markdown("---")
             st.markdown('<p class="section-header">AI Writing Coach</p>', unsafe_allow_html=True)
+            coach_slot = st.empty()
+            if coach is not None:
+                with coach_slot.container():
+                    if coach[0]:
+                        render_coach_feedback(coach[0])
+                    else:
+                        st.warning(f"⚠️ {coach[1]}")
+            elif pending:
+                coach_slot.markdown("""
+                <div class="text-box placeholder-box">Getting personalized feedback...</div>
+                """, unsafe_allow_html=True)
+            else:
+                coach_slot.markdown("""
+                <div class="text-box placeholder-box">Click Analyze for personalized feedback</div>
+                """, unsafe_allow_html=True)
 
-            with st.spinner("Getting personalized feedback..."):
-                ai_feedback, ai_error = get_full_analysis(text)
+        TRACER.record("render", time.perf_counter() - render_started)
+        ai_started = time.perf_counter()
 
-            if ai_feedback:
-                st.markdown(f"""
-                <div class="ai-feedback" style="white-space: pre-wrap;">
-{ai_feedback}
-                </div>
-                """, unsafe_allow_html=True)
-            elif ai_error:
-                st.warning(f"⚠️ {ai_error}")
+        # Fill each card and stream the coach as results arrive;
+        # retry singly only the rewrites the batch missed
+        coach_text = ""
+        first_token = None
+        if pending and rewrites is None:
+            rewrites = [None if i < AI_REWRITE_ISSUES else rule_rewrite(issue) for i, issue in enumerate(results['issues'])]
+        heartbeat = st.empty()
+        try:
+            while pending:
+                try:
+                    kind, i, payload = events.get(timeout=RERUN_POLL)
+                except queue.Empty:
+                    # Any st call lets Streamlit stop this run if the user reran or edited
+                    heartbeat.empty()
+                    continue
+                if kind == 'batch':
+                    pending -= 1
+                    batch_rewrites, batch_error = payload.result()
+                    for i, rewrite in enumerate(batch_rewrites):
+                        issue = results['issues'][i]
+                        if rewrite or batch_error:
+                            rewrites[i] = (rewrite, batch_error)
+                            render_issue_card(card_slots[i], issue, revised_html(issue, rewrite, batch_error, use_ai))
+                        else:
+                            submit(provider.get_ai_suggestion(issue['type'], issue['original'], api_key), 'rewrite', i)
+                            pending += 1
+                elif kind == 'rewrite':
+                    pending -= 1
+                    ai_suggestion, ai_error = payload.result()
+                    rewrites[i] = (ai_suggestion, ai_error)
+                    issue = results['issues'][i]
+                    render_issue_card(card_slots[i], issue, revised_html(issue, ai_suggestion, ai_error, use_ai))
+                elif kind == 'coach_chunk':
+                    if first_token is None:
+                        first_token = time.perf_counter() - coach_started
+                    coach_text += payload
+                    with coach_slot.container():
+                        render_coach_feedback(coach_text)
+                elif kind == 'coach':
+                    pending -= 1
+                    ai_feedback, ai_error = payload.result()
+                    coach = (ai_feedback, ai_error)
+                    with coach_slot.container():
+                        if ai_feedback:
+                            render_coach_feedback(ai_feedback)
+                            if first_token is not None:
+                                st.caption(f"First words after {first_token:.1f}s")
+                        elif ai_error:
+                            st.warning(f"⚠️ {ai_error}")
+        finally:
+            # A rerun stops the script inside an st call; drop whatever it was waiting for
+            for future in futures:
+                future.cancel()
+
+        if futures:
+            TRACER.record("ai_results", time.perf_counter() - ai_started)
+
+        # Keep AI output once every request has answered, errors included; the
+        # next Analyze click retries the failed ones
+        if not cached or futures:
+            entry = {'results': results}
+            if rewrites is not None and all(rewrites):
+                entry['rewrites'] = rewrites
+            if coach is not None:
+                entry['coach'] = coach
+            RESULT_CACHE.put(analysis_key, entry)
+
+        if METRICS_FILE:
+            with open(METRICS_FILE + ".tmp", "w") as f:
+                f.write(TRACER.to_prometheus())
+            os.replace(METRICS_FILE + ".tmp", METRICS_FILE)
 
         # Footer message
         st.markdown("---")
@@ -872,3 +514,38 @@ st.markdown("""
     </p>
 </div>
 """, unsafe_allow_html=True)
+
+# Performance panel (drawn last so it includes this run)
+if show_timings:
+    with st.sidebar:
+        st.markdown("### Performance")
+        snapshot = TRACER.snapshot()
+        if snapshot['stages']:
+            st.dataframe(
+                [
+                    {
+                        "stage": stage,
+                        "calls": stats['count'],
+                        "last ms": round(stats['last'] * 1000, 1),
+                        "avg ms": round(stats['total'] / stats['count'] * 1000, 1),
+                        "max ms": round(stats['max'] * 1000, 1),
+                    }
+                    for stage, stats in sorted(snapshot['stages'].items())
+                ],
+                hide_index=True,
+            )
+        key_stats = get_key_stats(get_api_key())
+        if len(key_stats) > 1:
+            st.dataframe(key_stats, hide_index=True)
+        st.caption(f"{'⚠️ ' if first_paint > FIRST_PAINT_TARGET else ''}first paint: "
+                   f"{first_paint * 1000:.0f} ms (target {FIRST_PAINT_TARGET * 1000:.0f} ms)")
+        cache_stats = RESULT_CACHE.stats()
+        st.caption(
+            f"result cache: {cache_stats['entries']} entries, {cache_stats['bytes'] // 1024} KB, "
+            f"{cache_stats['hits']} hits / {cache_stats['misses']} misses"
+        )
+        for counter in snapshot['counters']:
+            labels = ", ".join(f"{k}={v}" for k, v in counter['labels'].items())
+            st.caption(f"{counter['name']}{f' ({labels})' if labels else ''}: {counter['value']}")
+        st.download_button("Export JSON", TRACER.to_json(), "timings.json", "application/json")
+        st.download_button("Export Prometheus", TRACER.to_prometheus(), "timings.prom", "text/plain")